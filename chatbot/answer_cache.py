@@ -0,0 +1,76 @@
+# chatbot/answer_cache.py
+"""
+Semantic cache of chatbot answers, per document. A question whose embedding
+is within CHATBOT_ANSWER_CACHE_THRESHOLD cosine of an earlier question about
+the same document gets the earlier answer instead of a new LLM call.
+
+Entries live in the "answers" Django cache under a key that includes the
+document's embedding timestamp, so reprocessing a document (which rewrites
+its embedding) starts it with an empty cache.
+"""
+
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+from documents.models import DocumentEmbedding
+from documents.vectors import normalize
+
+cache = caches["answers"]
+
+STATS_KEYS = {"hits": "chat-answers:hits", "misses": "chat-answers:misses"}
+
+
+def _key(document):
+    updated_at = (
+        DocumentEmbedding.objects.filter(document=document)
+        .values_list("updated_at", flat=True)
+        .first()
+    )
+    version = int(updated_at.timestamp() * 1_000_000) if updated_at else 0
+    return f"chat-answers:{document.id}:{version}"
+
+
+def _count(outcome):
+    key = STATS_KEYS[outcome]
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:  # evicted between add and incr
+            cache.set(key, 1, None)
+
+
+def _fresh(entries):
+    cutoff = time.time() - settings.CHATBOT_ANSWER_CACHE_TTL
+    return [entry for entry in entries if entry[2] >= cutoff]
+
+
+def lookup(document, question_vec):
+    """A cached answer to a near-identical question, or None."""
+    entries = _fresh(cache.get(_key(document), []))
+    if entries:
+        vectors = np.array([vector for vector, _, _ in entries], dtype=np.float32)
+        scores = vectors @ normalize(question_vec)
+        best = int(np.argmax(scores))
+        if scores[best] >= settings.CHATBOT_ANSWER_CACHE_THRESHOLD:
+            _count("hits")
+            return entries[best][1]
+    _count("misses")
+    return None
+
+
+def store(document, question_vec, answer):
+    key = _key(document)
+    entries = _fresh(cache.get(key, []))
+    entries.append((normalize(question_vec).tolist(), answer, time.time()))
+    entries = entries[-settings.CHATBOT_ANSWER_CACHE_MAX_ENTRIES :]
+    cache.set(key, entries, settings.CHATBOT_ANSWER_CACHE_TTL)
+
+
+def stats():
+    counts = {outcome: cache.get(key, 0) for outcome, key in STATS_KEYS.items()}
+    lookups = counts["hits"] + counts["misses"]
+    counts["hit_rate"] = round(counts["hits"] / lookups, 4) if lookups else 0.0
+    return counts
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ChatbotConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'chatbot'
+
+    def ready(self):
+        from documents.registry import registry
+        from .utils import load_gemini_model
+
+        registry.register("gemini", load_gemini_model)
@@ -0,0 +1,274 @@
+# chatbot/client.py
+"""
+HTTP client for the Gemini REST API (or anything speaking it, such as
+`manage.py run_llm_standin`), shared by every request of the process.
+
+- one pooled requests.Session, so connections are reused between calls
+- a deadline per call covering queueing, every attempt and the backoff
+- at most CHATBOT_LLM_MAX_CONCURRENCY calls in flight; callers beyond that
+  wait, and beyond CHATBOT_LLM_MAX_QUEUE waiting ones are turned away at once
+- retries of timeouts, connection errors, 429 and 5xx with jittered
+  exponential backoff
+- a circuit breaker that fails fast while the upstream keeps failing
+"""
+
+import json
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMOverloaded(LLMError):
+    """Too many calls are already waiting for a slot."""
+
+
+class LLMUnavailable(LLMError):
+    """The circuit breaker is open; the upstream is not being called."""
+
+
+class LLMTimeout(LLMError):
+    """The call did not finish before its deadline."""
+
+
+class CircuitBreaker:
+    """
+    Opens after ``failures`` consecutive failures and rejects calls for
+    ``reset_after`` seconds; then lets one trial call through, which closes
+    it again on success or re-opens it on failure.
+    """
+
+    def __init__(self, failures, reset_after):
+        self.failures = failures
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self._failed = 0
+        self._opened_at = None
+        self._trial = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_after:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial or time.monotonic() - self._opened_at < self.reset_after:
+                return False
+            self._trial = True
+            return True
+
+    def success(self):
+        with self._lock:
+            self._failed, self._opened_at, self._trial = 0, None, False
+
+    def failure(self):
+        with self._lock:
+            self._failed += 1
+            if self._trial or self._failed >= self.failures:
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+
+class LLMClient:
+    def __init__(
+        self,
+        base_url,
+        model,
+        api_key="",
+        timeout=30.0,
+        max_concurrency=8,
+        max_queue=32,
+        retries=2,
+        backoff=0.5,
+        breaker_failures=5,
+        breaker_reset=30.0,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.api_key = api_key
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.in_flight = 0
+        self.stats_counts = {
+            "calls": 0,
+            "retries": 0,
+            "overloaded": 0,
+            "rejected_open": 0,
+            "timeouts": 0,
+            "failures": 0,
+        }
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            settings.CHATBOT_LLM_URL,
+            settings.CHATBOT_LLM_MODEL,
+            api_key=settings.GOOGLE_API_KEY or "",
+            timeout=settings.CHATBOT_LLM_TIMEOUT,
+            max_concurrency=settings.CHATBOT_LLM_MAX_CONCURRENCY,
+            max_queue=settings.CHATBOT_LLM_MAX_QUEUE,
+            retries=settings.CHATBOT_LLM_RETRIES,
+            backoff=settings.CHATBOT_LLM_BACKOFF,
+            breaker_failures=settings.CHATBOT_LLM_BREAKER_FAILURES,
+            breaker_reset=settings.CHATBOT_LLM_BREAKER_RESET,
+        )
+
+    def _count(self, name):
+        with self._lock:
+            self.stats_counts[name] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.stats_counts,
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "breaker": self.breaker.state,
+            }
+
+    def _acquire(self, deadline):
+        acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            with self._lock:
+                if self.waiting >= self.max_queue:
+                    self.stats_counts["overloaded"] += 1
+                    raise LLMOverloaded(
+                        f"{self.waiting} LLM calls already waiting; try again later"
+                    )
+                self.waiting += 1
+            try:
+                acquired = self._slots.acquire(
+                    timeout=max(0, deadline - time.monotonic())
+                )
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+        if not acquired:
+            self._count("timeouts")
+            raise LLMTimeout("Timed out waiting for a free LLM slot")
+        with self._lock:
+            self.in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def _post(self, method, prompt, deadline, **params):
+        """The upstream response of the first attempt that succeeds."""
+        if not self.breaker.allow():
+            self._count("rejected_open")
+            raise LLMUnavailable("LLM upstream is failing; circuit breaker is open")
+        url = f"{self.base_url}/models/{self.model}:{method}"
+        body = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        headers = {"x-goog-api-key": self.api_key} if self.api_key else {}
+
+        error = None
+        for attempt in range(self.retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                response = self.session.post(
+                    url,
+                    json=body,
+                    params=params,
+                    headers=headers,
+                    timeout=(min(3.05, remaining), remaining),
+                    stream=method == "streamGenerateContent",
+                )
+            except requests.RequestException as e:
+                error = e
+            else:
+                if response.status_code < 400:
+                    self.breaker.success()
+                    return response
+                error = LLMError(f"LLM upstream returned {response.status_code}")
+                response.close()
+                if response.status_code not in RETRY_STATUSES:
+                    # Our request is wrong; the upstream itself is fine and
+                    # retrying won't help.
+                    self.breaker.success()
+                    raise error
+
+            if attempt < self.retries:
+                # "Full jitter": spreads the retries of many callers apart.
+                pause = random.uniform(0, self.backoff * 2**attempt)
+                if time.monotonic() + pause >= deadline:
+                    break
+                self._count("retries")
+                time.sleep(pause)
+
+        self.breaker.failure()
+        if time.monotonic() >= deadline:
+            self._count("timeouts")
+            raise LLMTimeout(f"LLM call exceeded its {self.timeout}s deadline")
+        self._count("failures")
+        raise LLMError(f"LLM call failed: {error}")
+
+    def generate(self, prompt, timeout=None):
+        """The model's answer to ``prompt``."""
+        deadline = time.monotonic() + (timeout or self.timeout)
+        self._count("calls")
+        self._acquire(deadline)
+        try:
+            data = self._post("generateContent", prompt, deadline).json()
+        finally:
+            self._release()
+        return _text(data).strip()
+
+    def stream(self, prompt, timeout=None):
+        """
+        Generator of answer fragments as the model produces them; the slot is
+        held until the stream is exhausted or closed.
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+        self._count("calls")
+        self._acquire(deadline)
+        try:
+            response = self._post("streamGenerateContent", prompt, deadline, alt="sse")
+            with response:
+                for line in response.iter_lines(decode_unicode=True):
+                    if line and line.startswith("data:"):
+                        text = _text(json.loads(line[len("data:") :]))
+                        if text:
+                            yield text
+        finally:
+            self._release()
+
+
+def _text(data):
+    candidates = data.get("candidates") or [{}]
+    parts = candidates[0].get("content", {}).get("parts", [])
+    return "".join(part.get("text", "") for part in parts)
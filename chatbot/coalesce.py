@@ -0,0 +1,131 @@
+# chatbot/coalesce.py
+"""
+Single-flight request coalescing: while an answer for a key is being
+generated, identical requests wait for that call instead of starting their
+own, and all of them get its result (or its error).
+
+``do(key, fn)`` is for the sync views (threads block on the leader);
+``stream(key, make_stream)`` is for the async streaming view: the source
+stream runs once in a task and every caller receives all its fragments,
+including ones produced before it joined.
+"""
+
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Broadcast:
+    def __init__(self):
+        self.fragments = []
+        self.done = False
+        self.error = None
+        self.changed = asyncio.Condition()
+        self.task = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> _Call
+        self._streams = {}  # (event loop, key) -> _Broadcast
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _count(self, leader):
+        with self._lock:
+            if leader:
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+    def do(self, key, fn):
+        """``fn()``, unless a call for ``key`` is running: then its result."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        self._count(leader)
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+    async def stream(self, key, make_stream):
+        """
+        The fragments of ``make_stream()``, an async iterator that is started
+        only if no stream for ``key`` is running on this event loop. It runs
+        to completion even if callers go away, so joiners are never stranded.
+        """
+        flight_key = (asyncio.get_running_loop(), key)
+        broadcast = self._streams.get(flight_key)
+        leader = broadcast is None
+        if leader:
+            broadcast = self._streams[flight_key] = _Broadcast()
+            broadcast.task = asyncio.ensure_future(
+                self._run(flight_key, broadcast, make_stream())
+            )
+        self._count(leader)
+
+        sent = 0
+        while True:
+            async with broadcast.changed:
+                await broadcast.changed.wait_for(
+                    lambda: len(broadcast.fragments) > sent or broadcast.done
+                )
+            while sent < len(broadcast.fragments):
+                sent += 1
+                yield broadcast.fragments[sent - 1]
+            if broadcast.done and sent == len(broadcast.fragments):
+                if broadcast.error is not None:
+                    raise broadcast.error
+                return
+
+    async def _run(self, flight_key, broadcast, source):
+        try:
+            async for fragment in source:
+                async with broadcast.changed:
+                    broadcast.fragments.append(fragment)
+                    broadcast.changed.notify_all()
+        except Exception as e:
+            broadcast.error = e
+        finally:
+            del self._streams[flight_key]
+            async with broadcast.changed:
+                broadcast.done = True
+                broadcast.changed.notify_all()
+
+    def stats(self):
+        with self._lock:
+            requests = self.leaders + self.coalesced
+            return {
+                "in_flight": len(self._calls) + len(self._streams),
+                "llm_calls": self.leaders,
+                "coalesced": self.coalesced,
+                "coalesced_rate": (
+                    round(self.coalesced / requests, 4) if requests else 0.0
+                ),
+            }
+
+
+answer_flights = SingleFlight()
@@ -0,0 +1,66 @@
+# chatbot/context.py
+"""
+Retrieval-grounded context for chatbot answers: the passages (chunks) of the
+session's document most similar to the question, packed into a token budget.
+"""
+
+import re
+
+import numpy as np
+from django.conf import settings
+
+from documents.models import DocumentChunk
+from documents.vectors import decode_matrix, normalize
+
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text):
+    """
+    Rough LLM token count: words and punctuation marks. Sub-word tokenizers
+    produce somewhat more, so budgets should leave headroom.
+    """
+    return len(TOKEN_RE.findall(text))
+
+
+def select_passages(document, question_vec, budget=None, min_score=None):
+    """
+    Texts of the chunks of ``document`` most similar to the question that fit
+    in ``budget`` tokens together, in reading order. Chunks scoring below
+    ``min_score`` are never sent.
+    """
+    budget = settings.CHATBOT_CONTEXT_TOKENS if budget is None else budget
+    if min_score is None:
+        min_score = settings.CHATBOT_MIN_PASSAGE_SCORE
+    rows = list(
+        DocumentChunk.objects.filter(document=document).values_list(
+            "index", "text", "vector"
+        )
+    )
+    if not rows:
+        return []
+
+    scores = decode_matrix(vector for _, _, vector in rows) @ normalize(question_vec)
+    chosen, used = [], 0
+    for position in np.argsort(-scores, kind="stable"):
+        if scores[position] < min_score:
+            break
+        index, text, _ = rows[position]
+        tokens = count_tokens(text)
+        if used + tokens > budget:
+            continue  # a shorter passage further down may still fit
+        chosen.append((index, text))
+        used += tokens
+    return [text for _, text in sorted(chosen)]
+
+
+def build_context(document, question_vec, budget=None):
+    """
+    Context for answering a question about ``document``: the relevant
+    passages, or the summary when the document has no chunks or none of
+    them is relevant enough.
+    """
+    passages = select_passages(document, question_vec, budget)
+    if passages:
+        return "\n\n".join(passages)
+    return document.summary or ""
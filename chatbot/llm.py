@@ -0,0 +1,100 @@
+# chatbot/llm.py
+"""
+Pluggable LLM backends for the chatbot, chosen by settings.CHATBOT_LLM_BACKEND.
+"http" calls the Gemini REST API through the pooled, rate-limited LLMClient
+(chatbot/client.py); "gemini" goes through the google-generativeai SDK
+instead; "stub" answers locally so the chat flow can be
+tested and prompt sizes and latencies measured without network access or an
+API key.
+
+``generate(prompt)`` returns the whole answer; ``stream(prompt)`` is an async
+generator of answer fragments as the model produces them.
+"""
+
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from documents.registry import LazyModel
+from .client import LLMClient
+
+
+class GeminiBackend:
+    name = "gemini"
+
+    def __init__(self):
+        # Configured on first use (see chatbot.utils.load_gemini_model)
+        self.model = LazyModel("gemini")
+
+    def generate(self, prompt):
+        return self.model.generate_content(prompt).text.strip()
+
+    async def stream(self, prompt):
+        response = await self.model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+
+class HTTPBackend:
+    name = "http"
+
+    def __init__(self):
+        self.client = LLMClient.from_settings()
+
+    def generate(self, prompt):
+        return self.client.generate(prompt)
+
+    async def stream(self, prompt):
+        # The client blocks, so each fragment is read in a worker thread;
+        # the event loop stays free while the model is generating.
+        fragments = self.client.stream(prompt)
+        read = sync_to_async(next, thread_sensitive=False)
+        try:
+            while (fragment := await read(fragments, None)) is not None:
+                yield fragment
+        finally:
+            await sync_to_async(fragments.close, thread_sensitive=False)()
+
+
+class StubBackend:
+    """
+    Echoes the start of the prompt's context; remembers every prompt it got.
+    Streams one word every CHATBOT_STUB_TOKEN_DELAY seconds, like a model.
+    """
+
+    name = "stub"
+
+    def __init__(self):
+        self.prompts = []
+
+    def generate(self, prompt):
+        self.prompts.append(prompt)
+        context = prompt.split("Document data:", 1)[-1].split("Question:", 1)[0]
+        words = context.split()
+        return " ".join(words[:25]) or "I don't know."
+
+    async def stream(self, prompt):
+        words = self.generate(prompt).split(" ")
+        for position, word in enumerate(words):
+            await asyncio.sleep(settings.CHATBOT_STUB_TOKEN_DELAY)
+            yield word if position == 0 else " " + word
+
+
+BACKENDS = {
+    backend.name: backend for backend in [HTTPBackend, GeminiBackend, StubBackend]
+}
+_instances = {}
+
+
+def get_backend(name=None):
+    """The (shared) backend instance for ``name`` or CHATBOT_LLM_BACKEND."""
+    name = name or settings.CHATBOT_LLM_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(
+            f"Unknown LLM backend '{name}', expected one of {', '.join(BACKENDS)}"
+        )
+    if name not in _instances:
+        _instances[name] = BACKENDS[name]()
+    return _instances[name]
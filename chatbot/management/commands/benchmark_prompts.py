@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot.context import build_context, count_tokens
+from chatbot.llm import get_backend
+from chatbot.views import build_prompt
+from documents.caches import embed_queries
+from documents.models import Document
+
+DEFAULT_QUESTIONS = [
+    "What is this document about?",
+    "Who are the parties involved?",
+    "What are the key dates and amounts?",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare prompt sizes of summary-only and retrieved-passage context "
+        "for chatbot questions, answering with the offline stub LLM."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--questions", nargs="+", default=DEFAULT_QUESTIONS)
+        parser.add_argument("--limit", type=int, default=20, help="Documents to use.")
+        parser.add_argument(
+            "--budget", type=int, default=None, help="Context token budget."
+        )
+
+    def handle(self, *args, **options):
+        documents = list(
+            Document.objects.filter(chunks__isnull=False)
+            .distinct()
+            .order_by("id")[: options["limit"]]
+        )
+        if not documents:
+            raise CommandError("No chunked documents to benchmark.")
+
+        stub = get_backend("stub")
+        vectors = embed_queries(options["questions"])
+        summary_tokens, context_tokens = [], []
+        started = time.perf_counter()
+        for doc in documents:
+            for question, vector in zip(options["questions"], vectors):
+                summary_tokens.append(
+                    count_tokens(build_prompt(doc.summary or "", question))
+                )
+                prompt = build_prompt(
+                    build_context(doc, vector, options["budget"]), question
+                )
+                context_tokens.append(count_tokens(prompt))
+                stub.generate(prompt)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{len(documents)} document(s) x {len(options['questions'])} question(s)\n"
+            f"{'context':<10} {'mean tokens':>12} {'max tokens':>11}\n"
+            f"{'summary':<10} {sum(summary_tokens) / len(summary_tokens):>12.0f} "
+            f"{max(summary_tokens):>11}\n"
+            f"{'retrieved':<10} {sum(context_tokens) / len(context_tokens):>12.0f} "
+            f"{max(context_tokens):>11}\n"
+            f"Context building + stub answers: "
+            f"{elapsed * 1000 / len(context_tokens):.1f} ms/question"
+        )
@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from chatbot.utils import create_chat_session
+from documents.caches import embedder
+from documents.models import Document
+from documents.vectors import encode_vector
+from users.models import User
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare chat session creation that re-encodes the document summary "
+        "(the old behaviour) with reusing the document's embedding. Sessions "
+        "are created inside a transaction that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sessions", type=int, default=50)
+
+    def handle(self, *args, **options):
+        documents = list(
+            Document.objects.exclude(summary__isnull=True)
+            .exclude(summary="")
+            .order_by("id")[: options["sessions"]]
+        )
+        if not documents:
+            raise CommandError("No summarized documents to open sessions on.")
+        user = User.objects.order_by("id").first()
+        embedder.encode("warm up")  # keep model loading out of the timings
+
+        def encode_then_create(doc):
+            encode_vector(embedder.encode(doc.summary))
+            create_chat_session(user, doc.id)
+
+        def create(doc):
+            create_chat_session(user, doc.id)
+
+        rows = []
+        for label, open_session in [
+            ("re-encode", encode_then_create),
+            ("reuse", create),
+        ]:
+            timings = []
+            try:
+                with transaction.atomic():
+                    for i in range(options["sessions"]):
+                        started = time.perf_counter()
+                        open_session(documents[i % len(documents)])
+                        timings.append(time.perf_counter() - started)
+                    raise Rollback
+            except Rollback:
+                pass
+            timings.sort()
+            rows.append(
+                f"{label:<10} {sum(timings) / len(timings) * 1000:>9.2f} "
+                f"{timings[int(len(timings) * 0.95)] * 1000:>9.2f}"
+            )
+
+        self.stdout.write(
+            f"{options['sessions']} session(s) over {len(documents)} document(s)\n"
+            f"{'path':<10} {'mean ms':>9} {'p95 ms':>9}\n" + "\n".join(rows)
+        )
@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from chatbot.context import build_context
+from chatbot.llm import get_backend
+from chatbot.views import build_prompt
+from documents.caches import embed_query
+from documents.models import Document
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure time to first token and total time of streamed chatbot "
+        "answers, for several concurrent questions on one event loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--question", default="What is this document about?")
+        parser.add_argument("--backend", default="stub", help="LLM backend to use.")
+        parser.add_argument(
+            "--concurrency", type=int, default=10, help="Simultaneous streams."
+        )
+        parser.add_argument(
+            "--token-delay",
+            type=float,
+            default=0.02,
+            help="Seconds per word of the stub backend.",
+        )
+
+    def handle(self, *args, **options):
+        doc = Document.objects.filter(chunks__isnull=False).order_by("id").first()
+        if doc is None:
+            raise CommandError("No chunked documents to benchmark.")
+        context = build_context(doc, embed_query(options["question"]))
+        prompt = build_prompt(context, options["question"])
+        backend = get_backend(options["backend"])
+
+        async def one():
+            started = time.perf_counter()
+            first = None
+            fragments = 0
+            async for _ in backend.stream(prompt):
+                if first is None:
+                    first = time.perf_counter() - started
+                fragments += 1
+            return first or 0.0, time.perf_counter() - started, fragments
+
+        async def run():
+            return await asyncio.gather(*(one() for _ in range(options["concurrency"])))
+
+        with override_settings(CHATBOT_STUB_TOKEN_DELAY=options["token_delay"]):
+            started = time.perf_counter()
+            results = asyncio.run(run())
+            wall = time.perf_counter() - started
+
+        first, total, fragments = zip(*results)
+        self.stdout.write(
+            f"{len(results)} concurrent stream(s) of {fragments[0]} fragment(s), "
+            f"backend '{backend.name}'\n"
+            f"time to first token: {sum(first) / len(first) * 1000:.1f} ms mean, "
+            f"{max(first) * 1000:.1f} ms max\n"
+            f"time to full answer: {sum(total) / len(total) * 1000:.1f} ms mean, "
+            f"{max(total) * 1000:.1f} ms max\n"
+            f"wall time: {wall * 1000:.1f} ms"
+        )
@@ -0,0 +1,89 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from chatbot.client import LLMClient, LLMError
+from chatbot.standin import make_standin_server
+from chatbot.views import build_prompt
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent calls at the LLM client and report latency "
+        "percentiles and how many were answered, shed or failed. Without "
+        "--url a stand-in server is started in-process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", help="API base URL (default: local stand-in).")
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument(
+            "--threads", type=int, default=64, help="Concurrent callers."
+        )
+        parser.add_argument(
+            "--latency", type=float, default=0.2, help="Stand-in seconds per call."
+        )
+        parser.add_argument(
+            "--error-rate", type=float, default=0.0, help="Stand-in share of 503s."
+        )
+
+    def handle(self, *args, **options):
+        server = None
+        url = options["url"]
+        if not url:
+            server = make_standin_server(
+                latency=options["latency"], error_rate=options["error_rate"]
+            )
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            url = "http://%s:%d" % server.server_address[:2]
+
+        client = LLMClient(
+            url,
+            settings.CHATBOT_LLM_MODEL,
+            api_key=settings.GOOGLE_API_KEY if options["url"] else "",
+            timeout=settings.CHATBOT_LLM_TIMEOUT,
+            max_concurrency=settings.CHATBOT_LLM_MAX_CONCURRENCY,
+            max_queue=settings.CHATBOT_LLM_MAX_QUEUE,
+            retries=settings.CHATBOT_LLM_RETRIES,
+            backoff=settings.CHATBOT_LLM_BACKOFF,
+            breaker_failures=settings.CHATBOT_LLM_BREAKER_FAILURES,
+            breaker_reset=settings.CHATBOT_LLM_BREAKER_RESET,
+        )
+        prompt = build_prompt("The quarterly report shows revenue grew.", "Summary?")
+
+        def call(_):
+            started = time.perf_counter()
+            try:
+                client.generate(prompt)
+                outcome = "ok"
+            except LLMError as e:
+                outcome = type(e).__name__
+            return outcome, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options["threads"]) as pool:
+            results = list(pool.map(call, range(options["requests"])))
+        wall = time.perf_counter() - started
+        if server:
+            server.shutdown()
+            server.server_close()
+
+        outcomes = {}
+        for outcome, _ in results:
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        ok = np.array([elapsed for outcome, elapsed in results if outcome == "ok"])
+        self.stdout.write(
+            f"{len(results)} call(s) from {options['threads']} thread(s) in "
+            f"{wall:.2f}s ({len(results) / wall:.1f}/s)\n"
+            f"outcomes: {outcomes}"
+        )
+        if len(ok):
+            p50, p95, p99 = np.percentile(ok, [50, 95, 99]) * 1000
+            self.stdout.write(
+                f"answered latency: p50 {p50:.0f} ms, p95 {p95:.0f} ms, p99 {p99:.0f} ms"
+            )
+        self.stdout.write(f"client: {client.stats()}")
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from chatbot.standin import make_standin_server
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve a local stand-in for the Gemini REST API. Set CHATBOT_LLM_URL "
+        "to the printed address to load-test the chatbot without the real API."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument(
+            "--latency", type=float, default=0.5, help="Seconds before answering."
+        )
+        parser.add_argument(
+            "--token-delay",
+            type=float,
+            default=0.02,
+            help="Seconds between streamed words.",
+        )
+        parser.add_argument(
+            "--error-rate", type=float, default=0.0, help="Share of calls failing 503."
+        )
+
+    def handle(self, *args, **options):
+        server = make_standin_server(
+            options["host"],
+            options["port"],
+            options["latency"],
+            options["token_delay"],
+            options["error_rate"],
+        )
+        host, port = server.server_address[:2]
+        self.stdout.write(
+            f"LLM stand-in listening; CHATBOT_LLM_URL=http://{host}:{port}"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,54 @@
+# Converts pickled ChatSession.temp_embedding values to the binary format of
+# documents/vectors.py
+
+import pickle
+
+import numpy as np
+from django.db import migrations
+
+MAGIC = b"DV"
+VERSION = 1
+FLOAT32 = 1
+
+
+def encode(vec):
+    # Frozen copy of documents.vectors.encode_vector (float32).
+    vec = np.asarray(vec, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vec)
+    if norm:
+        vec = vec / norm
+    return MAGIC + bytes([VERSION, FLOAT32]) + vec.astype("<f4").tobytes()
+
+
+def forwards(apps, schema_editor):
+    ChatSession = apps.get_model("chatbot", "ChatSession")
+    batch = []
+    for session in ChatSession.objects.only("id", "temp_embedding").iterator():
+        blob = bytes(session.temp_embedding)
+        if blob and blob[:2] != MAGIC:
+            session.temp_embedding = encode(pickle.loads(blob))
+            batch.append(session)
+    ChatSession.objects.bulk_update(batch, ["temp_embedding"], batch_size=500)
+
+
+def backwards(apps, schema_editor):
+    ChatSession = apps.get_model("chatbot", "ChatSession")
+    batch = []
+    for session in ChatSession.objects.only("id", "temp_embedding").iterator():
+        blob = bytes(session.temp_embedding)
+        if blob[:2] == MAGIC:
+            vec = np.frombuffer(blob, dtype="<f4", offset=4)
+            session.temp_embedding = pickle.dumps(vec)
+            batch.append(session)
+    ChatSession.objects.bulk_update(batch, ["temp_embedding"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chatbot", "0002_chatsession_history"),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 5.2.6 on 2026-10-18 05:04
+
+# Moves each ChatSession.history JSON list into ChatMessage rows, one per
+# message, then drops the history field.
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def explode_histories(apps, schema_editor):
+    ChatSession = apps.get_model("chatbot", "ChatSession")
+    ChatMessage = apps.get_model("chatbot", "ChatMessage")
+    messages, sessions = [], []
+    for session in ChatSession.objects.only("id", "history").iterator():
+        history = session.history or []
+        messages += [
+            ChatMessage(
+                session_id=session.id,
+                sequence=sequence,
+                role=entry.get("role", "user"),
+                text=entry.get("text", ""),
+            )
+            for sequence, entry in enumerate(history)
+        ]
+        session.message_count = len(history)
+        sessions.append(session)
+        if len(messages) >= 5000:
+            ChatMessage.objects.bulk_create(messages, batch_size=1000)
+            messages = []
+    ChatMessage.objects.bulk_create(messages, batch_size=1000)
+    ChatSession.objects.bulk_update(sessions, ["message_count"], batch_size=500)
+
+
+def rebuild_histories(apps, schema_editor):
+    ChatSession = apps.get_model("chatbot", "ChatSession")
+    ChatMessage = apps.get_model("chatbot", "ChatMessage")
+    histories = {}
+    for session_id, role, text in (
+        ChatMessage.objects.order_by("session_id", "sequence")
+        .values_list("session_id", "role", "text")
+        .iterator()
+    ):
+        histories.setdefault(session_id, []).append({"role": role, "text": text})
+    sessions = list(ChatSession.objects.filter(id__in=histories).only("id"))
+    for session in sessions:
+        session.history = histories[session.id]
+    ChatSession.objects.bulk_update(sessions, ["history"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chatbot", "0003_encode_temp_embedding"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatsession",
+            name="message_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name="ChatMessage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("sequence", models.PositiveIntegerField()),
+                (
+                    "role",
+                    models.CharField(
+                        choices=[("user", "User"), ("bot", "Bot")], max_length=10
+                    ),
+                ),
+                ("text", models.TextField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "session",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="messages",
+                        to="chatbot.chatsession",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["session", "sequence"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("session", "sequence"),
+                        name="unique_chat_message_sequence",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(explode_histories, rebuild_histories),
+        migrations.RemoveField(
+            model_name="chatsession",
+            name="history",
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 05:06
+# Sessions use their document's embedding; the per-session copy is dropped.
+# Going backwards, the copies are restored from DocumentEmbedding.
+
+from django.db import migrations, models
+
+
+def restore_copies(apps, schema_editor):
+    ChatSession = apps.get_model("chatbot", "ChatSession")
+    DocumentEmbedding = apps.get_model("documents", "DocumentEmbedding")
+    vectors = dict(DocumentEmbedding.objects.values_list("document_id", "vector"))
+    sessions = list(ChatSession.objects.only("id", "document_id"))
+    for session in sessions:
+        session.temp_embedding = vectors.get(session.document_id, b"")
+    ChatSession.objects.bulk_update(sessions, ["temp_embedding"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chatbot", "0004_chatmessage"),
+        ("documents", "0016_documentterm"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="chatsession",
+            name="temp_embedding",
+            field=models.BinaryField(null=True),
+        ),
+        migrations.RunPython(migrations.RunPython.noop, restore_copies),
+        migrations.RemoveField(
+            model_name="chatsession",
+            name="temp_embedding",
+        ),
+    ]
@@ -11,9 +11,28 @@ class ChatSession(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     document = models.ForeignKey(Document, on_delete=models.CASCADE)
     session_id = models.CharField(max_length=100, unique=True)
-    temp_embedding = models.BinaryField()  # Pickled embedding (optional now)
-    history = models.JSONField(
-        default=list
-    )  # stores [{"role": "user", "text": "..."}, {"role": "bot", "text": "..."}]
+    message_count = models.PositiveIntegerField(default=0)  # next sequence number
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+
+class ChatMessage(models.Model):
+    """One message of a session's conversation; messages are only ever appended."""
+
+    ROLE_CHOICES = [("user", "User"), ("bot", "Bot")]
+
+    session = models.ForeignKey(
+        ChatSession, on_delete=models.CASCADE, related_name="messages"
+    )
+    sequence = models.PositiveIntegerField()  # 0, 1, 2, ... within the session
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+    text = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["session", "sequence"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["session", "sequence"], name="unique_chat_message_sequence"
+            )
+        ]
@@ -0,0 +1,8 @@
+from rest_framework import serializers
+from .models import ChatMessage
+
+
+class ChatMessageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChatMessage
+        fields = ["sequence", "role", "text", "created_at"]
@@ -0,0 +1,79 @@
+# chatbot/standin.py
+"""
+A local stand-in for the Gemini REST API, for load tests of the LLM client
+without network access, an API key or quota. It answers generateContent and
+streamGenerateContent (SSE) like the real API, with the stub backend's echo
+of the prompt's context, after a configurable latency, and fails a
+configurable share of calls with 503.
+"""
+
+import json
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .llm import StubBackend
+
+PATH_RE = re.compile(r"^/models/[^/:]+:(generateContent|streamGenerateContent)")
+
+
+def _payload(text):
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so client pooling is exercised
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        match = PATH_RE.match(self.path)
+        if not match:
+            self._reply(404, b'{"error": "not found"}')
+            return
+        server.requests += 1
+        time.sleep(server.latency)
+        if random.random() < server.error_rate:
+            self._reply(503, b'{"error": "overloaded"}')
+            return
+
+        prompt = json.loads(body)["contents"][0]["parts"][0]["text"]
+        answer = StubBackend().generate(prompt)
+        if match.group(1) == "generateContent":
+            self._reply(200, json.dumps(_payload(answer)).encode())
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for position, word in enumerate(answer.split(" ")):
+            time.sleep(server.token_delay)
+            text = word if position == 0 else " " + word
+            self.wfile.write(f"data: {json.dumps(_payload(text))}\r\n\r\n".encode())
+            self.wfile.flush()
+        self.close_connection = True
+
+
+def make_standin_server(
+    host="127.0.0.1", port=0, latency=0.0, token_delay=0.0, error_rate=0.0
+):
+    """A ThreadingHTTPServer (not yet serving); port 0 picks a free port."""
+    server = ThreadingHTTPServer((host, port), StandInHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.token_delay = token_delay
+    server.error_rate = error_rate
+    server.requests = 0
+    return server
@@ -1,3 +1,348 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from documents.models import Document, DocumentChunk, DocumentEmbedding
+from documents.vectors import encode_vector
+from users.models import User
+from . import answer_cache
+from .client import LLMClient, LLMError, LLMOverloaded, LLMUnavailable
+from .coalesce import SingleFlight
+from .context import count_tokens, select_passages
+from .llm import get_backend
+from .models import ChatSession
+from .standin import make_standin_server
+
+
+@override_settings(CHATBOT_LLM_BACKEND="stub", CHATBOT_MIN_PASSAGE_SCORE=0.2)
+class RetrievalContextTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        answer_cache.cache.clear()
+        self.user = User.objects.create_user("ivy", password="pw", role="HR")
+        self.doc = Document.objects.create(
+            uploader=self.user, file="a.txt", category="HR", summary="Leave policy."
+        )
+        passages = [
+            ("Employees accrue two days of annual leave per month.", [1, 0, 0]),
+            ("The office is closed on public holidays.", [0, 1, 0]),
+            ("Unused leave carries over until March.", [0.9, 0.1, 0]),
+        ]
+        for index, (text, vector) in enumerate(passages):
+            DocumentChunk.objects.create(
+                document=self.doc, index=index, text=text, vector=encode_vector(vector)
+            )
+
+    def test_packs_relevant_passages_in_reading_order(self):
+        passages = select_passages(self.doc, [1, 0, 0], budget=100)
+        self.assertEqual(
+            passages,
+            [
+                "Employees accrue two days of annual leave per month.",
+                "Unused leave carries over until March.",
+            ],
+        )
+        # Only the best passage fits a budget of its own size.
+        budget = count_tokens(passages[0])
+        self.assertEqual(select_passages(self.doc, [1, 0, 0], budget), passages[:1])
+
+    @mock.patch("chatbot.views.embed_query", return_value=np.array([0, 1, 0]))
+    def test_prompt_contains_only_retrieved_context(self, embed_query):
+        session = ChatSession.objects.create(
+            user=self.user,
+            document=self.doc,
+            session_id="s1",
+        )
+        client = APIClient()
+        client.force_authenticate(self.user)
+        stub = get_backend("stub")
+        stub.prompts.clear()
+
+        response = client.post(
+            "/api/chatbot/ask-question/",
+            {"session_id": session.session_id, "question": "When is it closed?"},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("public holidays", stub.prompts[-1])
+        self.assertNotIn("annual leave", stub.prompts[-1])
+        self.assertEqual(
+            [message["role"] for message in response.data["messages"]],
+            ["user", "bot"],
+        )
+
+    @mock.patch("chatbot.views.embed_query", return_value=np.array([0, 1, 0]))
+    async def test_streams_answer_as_events_and_saves_turn(self, embed_query):
+        session = await ChatSession.objects.acreate(
+            user=self.user,
+            document=self.doc,
+            session_id="s2",
+        )
+        token = str(RefreshToken.for_user(self.user).access_token)
+
+        response = await self.async_client.post(
+            "/api/chatbot/ask-question/stream/",
+            {"session_id": session.session_id, "question": "When is it closed?"},
+            content_type="application/json",
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        body = b"".join([chunk async for chunk in response.streaming_content])
+
+        events = [
+            (lines[0][len("event: ") :], json.loads(lines[1][len("data: ") :]))
+            for lines in (event.split("\n") for event in body.decode().split("\n\n"))
+            if lines[0]
+        ]
+        self.assertGreater(len(events), 2)
+        self.assertTrue(all(name == "token" for name, _ in events[:-1]))
+        name, done = events[-1]
+        self.assertEqual(name, "done")
+        self.assertEqual(
+            "".join(data["text"] for _, data in events[:-1]), done["answer"]
+        )
+        self.assertIn("public holidays", done["answer"])
+
+        last = await session.messages.alast()
+        self.assertEqual((last.role, last.text), ("bot", done["answer"]))
+
+    def test_messages_are_appended_and_paged(self):
+        session = ChatSession.objects.create(
+            user=self.user,
+            document=self.doc,
+            session_id="s3",
+        )
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for question in ["When is it closed?", "How much leave?", "Carry over?"]:
+            with mock.patch(
+                "chatbot.views.embed_query", return_value=np.array([1, 0, 0])
+            ):
+                response = client.post(
+                    "/api/chatbot/ask-question/",
+                    {"session_id": "s3", "question": question},
+                    format="json",
+                )
+        # Only the new turn comes back, unless the whole history is asked for.
+        self.assertEqual([m["sequence"] for m in response.data["messages"]], [4, 5])
+        self.assertNotIn("history", response.data)
+
+        url = "/api/chatbot/sessions/s3/messages/?page_size=4"
+        first = client.get(url).data
+        self.assertEqual([m["sequence"] for m in first["results"]], [0, 1, 2, 3])
+        second = client.get(first["next"]).data
+        self.assertEqual([m["sequence"] for m in second["results"]], [4, 5])
+        self.assertEqual(second["results"][0]["text"], "Carry over?")
+        self.assertIsNone(second["next"])
+
+        session.refresh_from_db()
+        self.assertEqual(session.message_count, 6)
+        other = User.objects.create_user("zed", password="pw", role="HR")
+        client.force_authenticate(other)
+        self.assertEqual(client.get(url).status_code, 404)
+
+    def test_include_history_is_parsed_as_a_boolean(self):
+        ChatSession.objects.create(user=self.user, document=self.doc, session_id="s4")
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        def ask(include_history):
+            with mock.patch(
+                "chatbot.views.embed_query", return_value=np.array([1, 0, 0])
+            ):
+                # Form-encoded, as an HTML form or curl -d would send it.
+                return client.post(
+                    "/api/chatbot/ask-question/",
+                    {
+                        "session_id": "s4",
+                        "question": "How much leave?",
+                        "include_history": include_history,
+                    },
+                )
+
+        self.assertNotIn("history", ask("false").data)
+        self.assertEqual(len(ask("true").data["history"]), 4)
+        self.assertEqual(ask("maybe").status_code, 400)
+
+    @mock.patch("documents.registry.registry.get")
+    @mock.patch("documents.signals.embedder")
+    def test_create_session_runs_no_model(self, embedder, load_model):
+        DocumentEmbedding.objects.create(
+            document=self.doc, vector=encode_vector([1, 0])
+        )
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.post(
+            "/api/chatbot/create-session/", {"document_id": self.doc.id}, format="json"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        embedder.encode.assert_not_called()
+        load_model.assert_not_called()
+        self.assertTrue(
+            ChatSession.objects.filter(session_id=response.data["session_id"]).exists()
+        )
+
+    @mock.patch("chatbot.views.embed_query", return_value=np.array([0, 1, 0]))
+    async def test_empty_streamed_answer_is_not_saved(self, embed_query):
+        session = await ChatSession.objects.acreate(
+            user=self.user, document=self.doc, session_id="s4"
+        )
+        token = str(RefreshToken.for_user(self.user).access_token)
+
+        async def blank(prompt):
+            yield "  "
+
+        with mock.patch.object(get_backend("stub"), "stream", blank):
+            response = await self.async_client.post(
+                "/api/chatbot/ask-question/stream/",
+                {"session_id": "s4", "question": "When is it closed?"},
+                content_type="application/json",
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            body = b"".join([chunk async for chunk in response.streaming_content])
+
+        self.assertIn(b"event: error", body)
+        self.assertNotIn(b"event: done", body)
+        self.assertFalse(await session.messages.aexists())
+        self.assertIsNone(await sync_to_async(answer_cache.lookup)(self.doc, [0, 1, 0]))
+
+    async def test_stream_requires_token(self):
+        response = await self.async_client.post(
+            "/api/chatbot/ask-question/stream/",
+            {"session_id": "s1", "question": "?"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(CHATBOT_LLM_BACKEND="stub", CHATBOT_ANSWER_CACHE_THRESHOLD=0.9)
+class AnswerCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        answer_cache.cache.clear()
+        user = User.objects.create_user("jack", password="pw", role="HR")
+        self.doc = Document.objects.create(uploader=user, file="a.txt", summary="s")
+        self.embedding = DocumentEmbedding.objects.create(
+            document=self.doc, vector=encode_vector([1, 0])
+        )
+
+    def test_similar_questions_hit_until_reprocessed(self):
+        answer_cache.store(self.doc, [1, 0, 0], "It is a leave policy.")
+        self.assertEqual(
+            answer_cache.lookup(self.doc, [1, 0.1, 0]), "It is a leave policy."
+        )
+        self.assertIsNone(answer_cache.lookup(self.doc, [0, 1, 0]))
+
+        self.embedding.save()  # reprocessing rewrites the embedding
+        self.assertIsNone(answer_cache.lookup(self.doc, [1, 0, 0]))
+        self.assertEqual(answer_cache.stats()["hit_rate"], 0.3333)
+
+    def test_entries_expire(self):
+        answer_cache.store(self.doc, [1, 0], "old")
+        with override_settings(CHATBOT_ANSWER_CACHE_TTL=-1):
+            self.assertIsNone(answer_cache.lookup(self.doc, [1, 0]))
+
+
+class LLMClientTests(SimpleTestCase):
+    def setUp(self):
+        self.server = make_standin_server()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = "http://%s:%d" % self.server.server_address[:2]
+        self.prompt = "Document data: the office opens at nine. Question: When?"
+
+    def test_generate_and_stream_against_stand_in(self):
+        client = LLMClient(self.url, "test-model")
+        self.assertEqual(client.generate(self.prompt), "the office opens at nine.")
+        self.assertEqual(
+            list(client.stream(self.prompt)),
+            ["the", " office", " opens", " at", " nine."],
+        )
+
+    def test_retries_then_opens_breaker(self):
+        self.server.error_rate = 1.0
+        client = LLMClient(
+            self.url, "test-model", retries=1, backoff=0, breaker_failures=2
+        )
+        for _ in range(2):
+            with self.assertRaises(LLMError):
+                client.generate(self.prompt)
+        with self.assertRaises(LLMUnavailable):
+            client.generate(self.prompt)
+        self.assertEqual(self.server.requests, 4)  # 2 calls x (1 + 1 retry)
+        self.assertEqual(client.stats()["breaker"], "open")
+
+    def test_sheds_load_beyond_queue(self):
+        client = LLMClient(self.url, "test-model", max_concurrency=1, max_queue=0)
+        stream = client.stream(self.prompt)
+        next(stream)  # holds the only slot
+        with self.assertRaises(LLMOverloaded):
+            client.generate(self.prompt)
+        stream.close()
+        self.assertEqual(client.generate(self.prompt), "the office opens at nine.")
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_identical_calls_share_one(self):
+        flights = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def answer():
+            calls.append(1)
+            release.wait(5)
+            return "shared answer"
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(flights.do(("doc", "q"), answer))
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        while flights.stats()["coalesced"] < 4:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(results, ["shared answer"] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flights.stats()["in_flight"], 0)
+        self.assertEqual(flights.do(("doc", "q"), lambda: "fresh"), "fresh")
+
+    def test_async_joiners_receive_every_fragment(self):
+        flights = SingleFlight()
+        started = []
+
+        async def source():
+            started.append(1)
+            for word in ["a", " b", " c"]:
+                await asyncio.sleep(0.01)
+                yield word
+
+        async def collect(delay):
+            await asyncio.sleep(delay)
+            return [f async for f in flights.stream("key", source)]
+
+        async def main():
+            return await asyncio.gather(collect(0), collect(0.015))
+
+        self.assertEqual(asyncio.run(main()), [["a", " b", " c"]] * 2)
+        self.assertEqual(len(started), 1)
+        self.assertEqual(flights.stats()["coalesced"], 1)
@@ -3,5 +3,17 @@ from . import views
 
 urlpatterns = [
     path("ask-question/", views.ask_question, name="ask-question"),
+    path(
+        "ask-question/stream/",
+        views.ask_question_stream,
+        name="ask-question-stream",
+    ),
     path("create-session/", views.create_session, name="create-session"),
+    path(
+        "sessions/<str:session_id>/messages/",
+        views.session_messages,
+        name="session-messages",
+    ),
+    path("answer-cache/", views.answer_cache_stats, name="answer-cache-stats"),
+    path("coalescing/", views.coalescing_stats, name="coalescing-stats"),
 ]
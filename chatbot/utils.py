@@ -1,29 +1,30 @@
 # chatbot/utils.py
-import pickle
 import uuid
+from django.conf import settings
 from documents.models import Document
-from documents.signals import embedder
+
+
+def load_gemini_model():
+    import google.generativeai as genai
+
+    genai.configure(api_key=settings.GOOGLE_API_KEY)
+    return genai.GenerativeModel("gemini-2.5-flash")
 
 
 def create_chat_session(user, document_id):
     doc = Document.objects.get(id=document_id)
 
-    # Use summary instead of full text
-    text = doc.summary or ""
-    if not text:
+    # Sessions answer from the processed document
+    if not doc.summary:
         raise ValueError("Document summary is missing.")
 
-    # Optional: still create embedding on summary if you need semantic search
-    temp_emb = embedder.encode(text)
-    temp_emb_pickle = pickle.dumps(temp_emb)
-
+    # No model inference here: answers come from what ingestion already
+    # computed for the document (summary, chunks and their embeddings)
     from .models import ChatSession
 
     session = ChatSession.objects.create(
         user=user,
         document=doc,
         session_id=str(uuid.uuid4()),
-        temp_embedding=temp_emb_pickle,
-        history=[],
     )
     return session.session_id
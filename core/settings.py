@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -163,3 +164,120 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Document ingestion queue (see documents/jobs.py and `manage.py ingestion_worker`)
+INGESTION_MAX_ATTEMPTS = 3  # retries before a job is marked failed
+INGESTION_POLL_INTERVAL = 2  # seconds a worker sleeps when the queue is empty
+INGESTION_STALE_AFTER = 30 * 60  # seconds without progress before a job is requeued
+
+# Document classification (see documents/classification.py)
+# "embedding": compare the MiniLM document vector with category prototypes and
+# only run zero-shot BART when the top-two margin is below CLASSIFIER_MARGIN,
+# or when no prototype reaches CLASSIFIER_MIN_SCORE (BART may then say
+# "Unknown", which has no prototype). Tune both with benchmark_classifier.
+# "zero-shot": always run BART-large-MNLI (slow on CPU).
+CLASSIFIER_MODE = "embedding"
+CLASSIFIER_MARGIN = 0.05
+CLASSIFIER_MIN_SCORE = 0.2  # cosine similarity to the best category prototype
+CLASSIFIER_USE_LABELLED_DOCUMENTS = False  # blend in centroids of stored docs
+
+# Chunk-level embeddings (see documents.signals.create_chunks)
+CHUNK_SIZE_WORDS = 200  # words per chunk window
+CHUNK_OVERLAP_WORDS = 40  # words shared by consecutive windows
+CHUNK_SEARCH_CANDIDATES = 200  # best documents re-scored by their chunks
+EMBEDDING_BATCH_SIZE = 32  # texts per embedder.encode batch
+
+# Stored embedding precision: "float32" or "float16" (half the size, ~3
+# significant digits). See documents/vectors.py.
+VECTOR_DTYPE = "float32"
+
+# Seconds between checks for embeddings written by other processes (ingestion
+# worker, bulk commands). See documents/index.py.
+VECTOR_INDEX_SYNC_INTERVAL = 2
+# Queries of a batch search scored per matrix product (memory: block x corpus)
+VECTOR_INDEX_QUERY_BLOCK = 64
+
+# Approximate nearest-neighbour search (see documents/ann.py). Build the index
+# with `manage.py build_ann_index`; until then, or while the corpus is smaller
+# than ANN_MIN_VECTORS, search is exact.
+ANN_INDEX_PATH = BASE_DIR / "indexes" / "ann_ivf.npz"
+ANN_MIN_VECTORS = 50_000
+ANN_N_PROBE = 16  # lists probed per query: higher = better recall, slower
+ANN_OVERSAMPLE = 2  # candidates fetched per requested result
+
+# Memory-mapped embedding store shared by all server processes (see
+# documents/store.py). One file per database, named after it.
+EMBEDDING_STORE_DIR = BASE_DIR / "indexes"
+
+# LRU cache of search query embeddings (documents/caches.py), per process
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+QUERY_EMBEDDING_CACHE_TTL = 3600  # seconds; None keeps entries until evicted
+
+# Cached search rankings (documents/caches.py) are invalidated by bumping a
+# generation counter in this cache from the document save/delete signals,
+# which run in the ingestion worker, so the cache must be shared by every
+# process: a database table (created by `migrate`) by default, or Redis /
+# Memcached for heavier traffic. Chatbot answers (chatbot/answer_cache.py)
+# have their own table, so culling search entries never evicts them or their
+# hit/miss counters.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "documind_cache",
+        "OPTIONS": {"MAX_ENTRIES": 20000},
+    },
+    "answers": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "documind_answer_cache",
+        "OPTIONS": {"MAX_ENTRIES": 20000},
+    },
+}
+SEARCH_CACHE_TTL = 300  # seconds
+
+# Hybrid search fuses this many semantic and BM25 candidates (documents/lexical.py)
+HYBRID_CANDIDATES = 100
+
+# Ranked search results: default and maximum depth (k), cursor page size
+SEARCH_DEFAULT_K = 50
+SEARCH_MAX_K = 500
+SEARCH_PAGE_SIZE = 10
+SEARCH_BATCH_MAX_QUERIES = 500  # per request to the batch search endpoint
+
+# Chatbot answers (see chatbot/context.py and chatbot/llm.py)
+CHATBOT_LLM_BACKEND = os.environ.get("CHATBOT_LLM_BACKEND", "http")  # or gemini, stub
+CHATBOT_CONTEXT_TOKENS = 1200  # budget for retrieved passages per prompt
+CHATBOT_MIN_PASSAGE_SCORE = 0.2  # cosine below which a passage is not sent
+
+# Semantic answer cache (see chatbot/answer_cache.py)
+CHATBOT_ANSWER_CACHE_THRESHOLD = 0.92  # question cosine similarity for a hit
+CHATBOT_ANSWER_CACHE_TTL = 24 * 60 * 60  # seconds
+CHATBOT_ANSWER_CACHE_MAX_ENTRIES = 100  # questions remembered per document
+CHATBOT_STUB_TOKEN_DELAY = 0.0  # seconds per streamed word from the stub LLM
+
+# LLM HTTP client (chatbot/client.py). Point CHATBOT_LLM_URL at
+# `manage.py run_llm_standin` for load tests without the real API.
+CHATBOT_LLM_URL = os.environ.get(
+    "CHATBOT_LLM_URL", "https://generativelanguage.googleapis.com/v1beta"
+)
+CHATBOT_LLM_MODEL = "gemini-2.5-flash"
+CHATBOT_LLM_TIMEOUT = 30.0  # seconds per call, queueing and retries included
+CHATBOT_LLM_MAX_CONCURRENCY = 8  # calls in flight per process
+CHATBOT_LLM_MAX_QUEUE = 32  # callers allowed to wait for a slot; more get a 503
+CHATBOT_LLM_RETRIES = 2
+CHATBOT_LLM_BACKOFF = 0.5  # seconds; doubled per retry, with full jitter
+CHATBOT_LLM_BREAKER_FAILURES = 5  # consecutive failed calls that open the breaker
+CHATBOT_LLM_BREAKER_RESET = 30.0  # seconds before a trial call is let through
+
+# Access (audit) log, see documents/audit.py. "sync" stores every event in the
+# request; "buffered" batches them, journaling to ACCESS_LOG_JOURNAL_DIR.
+# `manage.py test` stores events right away, so none are left buffered when
+# the test database is destroyed.
+ACCESS_LOG_MODE = os.environ.get(
+    "ACCESS_LOG_MODE", "sync" if sys.argv[1:2] == ["test"] else "buffered"
+)
+ACCESS_LOG_BUFFER_SIZE = 200  # events per bulk insert
+ACCESS_LOG_FLUSH_INTERVAL = 5.0  # seconds an event may wait; 0: full batches only
+ACCESS_LOG_JOURNAL_DIR = BASE_DIR / "logs" / "access"
+ACCESS_LOG_RETENTION_DAYS = 90  # raw events kept; older ones are archived
+ACCESS_LOG_ARCHIVE_DIR = BASE_DIR / "logs" / "archive"
+ACCESS_LOG_ANALYTICS_MAX_BUCKETS = 5000  # rows per analytics response
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Document, DocumentEmbedding, AccessLog
+from .models import Document, DocumentChunk, DocumentEmbedding, AccessLog, IngestionJob
 
 
 @admin.register(Document)
@@ -15,8 +15,21 @@ class DocumentEmbeddingAdmin(admin.ModelAdmin):
     readonly_fields = ("vector",)
 
 
+@admin.register(DocumentChunk)
+class DocumentChunkAdmin(admin.ModelAdmin):
+    list_display = ("document", "index")
+    readonly_fields = ("vector",)
+
+
 @admin.register(AccessLog)
 class AccessLogAdmin(admin.ModelAdmin):
     list_display = ("user", "document", "action", "timestamp")
     list_filter = ("action", "timestamp", "user")
     search_fields = ("user__username", "document__title")
+
+
+@admin.register(IngestionJob)
+class IngestionJobAdmin(admin.ModelAdmin):
+    list_display = ("document", "status", "progress", "stage", "attempts", "created_at")
+    list_filter = ("status",)
+    readonly_fields = ("error",)
@@ -0,0 +1,199 @@
+"""
+Approximate nearest-neighbour search with an inverted-file (IVF) index.
+
+Vectors are clustered with spherical k-means; each vector is stored in the
+list of its nearest centroid, and lists are laid out contiguously. A query
+scores the centroids, exactly scores only the vectors of the ``n_probe``
+closest lists, and returns the best of those. More probes means higher
+recall and more work, so ``n_probe`` is the recall/latency knob.
+"""
+
+import os
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+from django.conf import settings
+
+from .models import DocumentEmbedding
+from .vectors import decode_matrix, normalize
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def _assign(vectors, centroids, batch_size=65536):
+    """Index of the nearest (highest cosine) centroid for every vector."""
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), batch_size):
+        block = vectors[start : start + batch_size] @ centroids.T
+        assignment[start : start + batch_size] = np.argmax(block, axis=1)
+    return assignment
+
+
+def train_centroids(vectors, n_lists, iterations=10, sample_size=50000, seed=0):
+    """Spherical k-means on (a sample of) normalized vectors."""
+    rng = np.random.default_rng(seed)
+    if len(vectors) > sample_size:
+        vectors = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    n_lists = min(n_lists, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = _assign(vectors, centroids)
+        order = np.argsort(assignment, kind="stable")
+        lists, starts = np.unique(assignment[order], return_index=True)
+        sums = np.add.reduceat(vectors[order], starts, axis=0)
+        centroids[lists] = _normalize_rows(sums)
+        # Lists that lost all their vectors restart from a random vector.
+        empty = np.setdiff1d(np.arange(n_lists), lists)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(len(vectors), len(empty))]
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    def __init__(self, centroids, offsets, vectors, ids, categories, built_at):
+        self.centroids = centroids
+        self.offsets = offsets  # list l holds rows offsets[l]:offsets[l + 1]
+        self.vectors = vectors
+        self.ids = ids
+        self.categories = categories
+        self.built_at = built_at
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(
+        cls,
+        vectors,
+        ids,
+        categories,
+        n_lists=None,
+        iterations=10,
+        seed=0,
+        built_at=None,
+    ):
+        """
+        ``built_at`` must not be later than the moment ``vectors`` were read:
+        searches rescore every embedding written since then.
+        """
+        built_at = built_at or datetime.now(timezone.utc)
+        vectors = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+        if n_lists is None:
+            n_lists = max(1, int(4 * np.sqrt(len(vectors))))
+        centroids = train_centroids(vectors, n_lists, iterations, seed=seed)
+
+        assignment = _assign(vectors, centroids)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=len(centroids))
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(
+            centroids,
+            offsets,
+            np.ascontiguousarray(vectors[order]),
+            np.asarray(ids, dtype=np.int64)[order],
+            np.asarray(categories, dtype=str)[order],
+            built_at,
+        )
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            centroids=self.centroids,
+            offsets=self.offsets,
+            vectors=self.vectors,
+            ids=self.ids,
+            categories=self.categories,
+            built_at=np.array(self.built_at.isoformat()),
+        )
+        os.replace(tmp_path, path)  # readers never see a half-written file
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                data["centroids"],
+                data["offsets"],
+                data["vectors"],
+                data["ids"],
+                data["categories"],
+                datetime.fromisoformat(str(data["built_at"])),
+            )
+
+    def search(self, query_vec, k, n_probe, categories=None):
+        """
+        Approximate top ``k`` as (ids, scores) arrays, best first, probing the
+        ``n_probe`` lists whose centroids are closest to the query.
+        """
+        query = normalize(query_vec)
+        centroid_scores = self.centroids @ query
+        n_probe = min(n_probe, len(self.centroids))
+        probe = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+
+        rows = np.concatenate(
+            [np.arange(self.offsets[l], self.offsets[l + 1]) for l in probe]
+        )
+        if categories is not None:
+            rows = rows[np.isin(self.categories[rows], categories)]
+        if not len(rows):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        scores = self.vectors[rows] @ query
+        if k < len(rows):
+            top = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return self.ids[rows[order]], scores[order]
+
+
+def build_from_database(n_lists=None, iterations=10):
+    """An IVFIndex of every DocumentEmbedding, or None if there are none."""
+    # Taken before the read, so embeddings written while k-means trains are
+    # newer than the index and get rescored by searches.
+    snapshot = datetime.now(timezone.utc)
+    rows = list(
+        DocumentEmbedding.objects.values_list(
+            "document_id", "document__category", "vector"
+        ).order_by("id")
+    )
+    if not rows:
+        return None
+    ids, categories, blobs = zip(*rows)
+    return IVFIndex.build(
+        decode_matrix(blobs),
+        ids,
+        categories,
+        n_lists=n_lists,
+        iterations=iterations,
+        built_at=snapshot,
+    )
+
+
+_loaded = None
+_loaded_mtime = None
+_lock = threading.Lock()
+
+
+def get_ann_index():
+    """
+    The IVF index at settings.ANN_INDEX_PATH, or None if it was never built.
+    Reloaded when the file is replaced by `manage.py build_ann_index`.
+    """
+    global _loaded, _loaded_mtime
+    path = str(settings.ANN_INDEX_PATH)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    if mtime != _loaded_mtime:
+        with _lock:
+            if mtime != _loaded_mtime:
+                _loaded = IVFIndex.load(path)
+                _loaded_mtime = mtime
+    return _loaded
@@ -0,0 +1,246 @@
+"""
+Audit trail of who viewed, uploaded, changed or deleted what.
+
+With ACCESS_LOG_MODE = "sync" every event is an AccessLog insert inside the
+request, for deployments where an event must be stored before the response
+goes out. With "buffered" (the default) events are kept in memory and
+written with one bulk_create per ACCESS_LOG_BUFFER_SIZE events or
+ACCESS_LOG_FLUSH_INTERVAL seconds, and at shutdown, so reads don't take a
+write transaction each.
+
+Buffered events are also appended to a per-process journal file in
+ACCESS_LOG_JOURNAL_DIR before anything else happens, and the journal is only
+removed once its events are in the database. If the process dies first (or
+the insert fails), the journal is left behind and `manage.py
+replay_access_logs` inserts it. Each process also replays such journals in
+its background flush thread, off the request path, after its first event.
+"""
+
+import atexit
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from .models import AccessLog, Document
+
+_memory_db_dir = None
+
+
+def _journal_dir():
+    """ACCESS_LOG_JOURNAL_DIR; a per-process temp dir for in-memory databases."""
+    global _memory_db_dir
+    if connection.vendor == "sqlite" and connection.is_in_memory_db():
+        if _memory_db_dir is None:
+            _memory_db_dir = tempfile.mkdtemp(prefix="documind-access-")
+        return _memory_db_dir
+    return str(settings.ACCESS_LOG_JOURNAL_DIR)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def write_events(events):
+    """
+    Insert event dicts (user_id, document_id, action, timestamp) in bulk.
+    Events of documents deleted in the meantime keep their row with no
+    document; events of deleted users are dropped.
+    """
+    if not events:
+        return 0
+    document_ids = {e["document_id"] for e in events if e["document_id"] is not None}
+    existing_documents = set(
+        Document.objects.filter(id__in=document_ids).values_list("id", flat=True)
+    )
+    existing_users = set(
+        get_user_model()
+        .objects.filter(id__in={e["user_id"] for e in events})
+        .values_list("id", flat=True)
+    )
+    rows = [
+        AccessLog(
+            user_id=e["user_id"],
+            document_id=(
+                e["document_id"] if e["document_id"] in existing_documents else None
+            ),
+            action=e["action"],
+            timestamp=datetime.fromisoformat(e["timestamp"]),
+        )
+        for e in events
+        if e["user_id"] in existing_users
+    ]
+    AccessLog.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+class AccessLogBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._events = []
+        self._journal = None
+        self._journal_path = None
+        self._database = None
+        self._flushed_at = time.monotonic()
+        self._flushes = 0
+        self._started = False
+
+    def _start(self):
+        # Once per process (and again after a fork), under _start_lock: flush
+        # at exit, and start the background thread.
+        if self._started:
+            # A forked child: the parent writes what it had buffered, and the
+            # atexit hook is inherited.
+            self._events, self._journal = [], None
+        else:
+            atexit.register(self.flush)
+        leftover = os.path.join(_journal_dir(), f"access-{os.getpid()}.jsonl")
+        if os.path.exists(leftover):
+            # An earlier process with our pid (containers reuse them) died.
+            os.replace(leftover, f"{leftover}.stale.pending")
+        threading.Thread(
+            target=self._run_in_background,
+            args=(settings.ACCESS_LOG_FLUSH_INTERVAL,),
+            daemon=True,
+        ).start()
+        self._started = os.getpid()
+
+    def _run_in_background(self, interval):
+        # Pick up journals of processes that died, then flush periodically.
+        try:
+            replay_journals()
+        except Exception as e:
+            print("Could not replay access log journals:", str(e))
+        finally:
+            close_old_connections()
+        while interval:
+            time.sleep(interval)
+            if self._events and time.monotonic() - self._flushed_at >= interval:
+                self.flush()
+                close_old_connections()
+
+    def add(self, event):
+        if self._started != os.getpid():
+            with self._start_lock:
+                if self._started != os.getpid():
+                    self._start()
+        with self._lock:
+            if self._journal is None:
+                # The batch belongs to this database (tests swap it out).
+                self._database = connection.settings_dict["NAME"]
+                os.makedirs(_journal_dir(), exist_ok=True)
+                self._journal_path = os.path.join(
+                    _journal_dir(), f"access-{os.getpid()}.jsonl"
+                )
+                self._journal = open(self._journal_path, "a")
+            self._journal.write(json.dumps(event) + "\n")
+            self._journal.flush()  # in the OS page cache: survives a crash
+            self._events.append(event)
+            full = len(self._events) >= settings.ACCESS_LOG_BUFFER_SIZE
+        # Only a full batch is written in the request; time-based flushes are
+        # left to the background thread.
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered events to the database; returns how many."""
+        with self._lock:
+            events, self._events = self._events, []
+            self._flushed_at = time.monotonic()
+            if self._journal is None:
+                return 0
+            self._journal.close()
+            self._journal = None
+            # New events go to a fresh journal while this batch is written.
+            self._flushes += 1
+            pending = f"{self._journal_path}.{self._flushes}.pending"
+            os.replace(self._journal_path, pending)
+        if self._database != connection.settings_dict["NAME"]:
+            # Buffered against a test database that has been destroyed since.
+            os.remove(pending)
+            return 0
+        try:
+            written = write_events(events)
+        except Exception as e:
+            print("================== ERROR ==================")
+            print(f"Access log flush failed, events kept in {pending}:", str(e))
+            return 0
+        os.remove(pending)
+        return written
+
+    def stats(self):
+        with self._lock:
+            return {"buffered": len(self._events), "flushes": self._flushes}
+
+
+def replay_journals():
+    """
+    Insert the events of journals left behind by dead processes, and of this
+    process's failed flushes. Returns the number of events written.
+    """
+    written = 0
+    own = os.getpid()
+    for path in glob.glob(os.path.join(_journal_dir(), "access-*.jsonl*")):
+        name = os.path.basename(path)
+        if name.endswith(".replaying"):
+            # Claimed by a replay that may have died halfway.
+            path, claimer = path[: -len(".replaying")].rsplit(".", 1)
+            if int(claimer) == own or _pid_alive(int(claimer)):
+                continue
+            source = f"{path}.{claimer}.replaying"
+        else:
+            pid = int(name[len("access-") :].split(".", 1)[0])
+            if pid == own and not name.endswith(".pending"):
+                continue  # our live journal
+            if pid != own and _pid_alive(pid):
+                continue
+            source = path
+        claimed = f"{path}.{own}.replaying"
+        try:
+            os.rename(source, claimed)  # only one process gets each file
+        except FileNotFoundError:
+            continue
+        with open(claimed) as f:
+            # A crash mid-write can leave a partial last line.
+            events = []
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    pass
+        written += write_events(events)
+        os.remove(claimed)
+    return written
+
+
+access_log_buffer = AccessLogBuffer()
+
+
+def log_access(user, action, document=None):
+    """Record that ``user`` did ``action`` (to ``document``, if any)."""
+    if settings.ACCESS_LOG_MODE == "sync":
+        AccessLog.objects.create(user=user, document=document, action=action)
+        return
+    access_log_buffer.add(
+        {
+            "user_id": user.id,
+            "document_id": document.id if document is not None else None,
+            "action": action,
+            "timestamp": timezone.now().isoformat(),
+        }
+    )
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .index import vector_index
+from .registry import LazyModel
+
+embedder = LazyModel("embedder")
+
+
+def normalize_query(text):
+    """Collapse whitespace and case; the MiniLM embedder is uncased anyway."""
+    return " ".join(text.split()).lower()
+
+
+class LRUCache:
+    """
+    Bounded, thread-safe least-recently-used mapping whose entries expire
+    ``ttl`` seconds after they were stored (None: never).
+    """
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (
+                self.ttl is None or time.monotonic() - entry[0] < self.ttl
+            ):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+query_embeddings = LRUCache(
+    settings.QUERY_EMBEDDING_CACHE_SIZE, settings.QUERY_EMBEDDING_CACHE_TTL
+)
+
+
+def embed_query(text):
+    """
+    Embedding of a search query (or other short text), served from the LRU
+    cache when the same text was encoded recently. The returned array is
+    shared between callers and must not be modified.
+    """
+    key = normalize_query(text)
+    vector = query_embeddings.get(key)
+    if vector is None:
+        vector = embedder.encode(key)
+        vector.flags.writeable = False
+        query_embeddings.set(key, vector)
+    return vector
+
+
+def embed_queries(texts):
+    """
+    ``embed_query`` for many texts: cache misses are encoded together in one
+    embedder batch. Returns an (n, dim) matrix in the order of ``texts``.
+    """
+    keys = [normalize_query(text) for text in texts]
+    vectors = {}
+    for key in keys:
+        if key not in vectors:
+            vectors[key] = query_embeddings.get(key)
+    missing = [key for key, vector in vectors.items() if vector is None]
+    if missing:
+        encoded = embedder.encode(missing, batch_size=settings.EMBEDDING_BATCH_SIZE)
+        for key, vector in zip(missing, encoded):
+            vector.flags.writeable = False
+            query_embeddings.set(key, vector)
+            vectors[key] = vector
+    return np.stack([vectors[key] for key in keys])
+
+
+SEARCH_GENERATION_KEY = "search:generation"
+
+
+def _fresh_generation():
+    # Seeded from the clock rather than 1, so a counter that was evicted from
+    # the cache never restarts at a value older results were stored under.
+    return time.time_ns() // 1000
+
+
+def search_generation():
+    return cache.get_or_set(SEARCH_GENERATION_KEY, _fresh_generation, None)
+
+
+def bump_search_generation():
+    """Invalidate every cached search result (documents or vectors changed)."""
+    try:
+        cache.incr(SEARCH_GENERATION_KEY)
+    except ValueError:  # not set yet, or evicted
+        cache.set(SEARCH_GENERATION_KEY, _fresh_generation(), None)
+
+
+def cached_search(query, user, search, **options):
+    """
+    Ranked (document_id, score) hits for ``query`` as seen by ``user``, from
+    the cache if this query was run since documents last changed, otherwise
+    from ``search()``. ``options`` are the other parameters that shape the
+    ranking (granularity, n_probe, ...).
+    """
+    key_parts = [
+        normalize_query(query),
+        user.role,
+        user.is_superuser,
+        sorted(options.items()),
+    ]
+    digest = hashlib.sha256(json.dumps(key_parts).encode()).hexdigest()
+    key = f"search:{search_generation()}:{digest}"
+    hits = cache.get(key)
+    if hits is None:
+        # The generation may have been bumped by another process whose
+        # writes this process's index hasn't synced yet; without this the
+        # stale ranking would be stored under the new generation.
+        vector_index.sync(force=True)
+        hits = search()
+        cache.set(key, hits, settings.SEARCH_CACHE_TTL)
+    return hits
@@ -0,0 +1,114 @@
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from .models import DocumentEmbedding
+from .signals import CATEGORIES, category_from_label, classifier, embedder
+from .vectors import decode_matrix
+
+_prototypes = None
+_prototypes_lock = threading.Lock()
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def build_prototypes():
+    """
+    One unit vector per category, embedded from its CATEGORIES description.
+    With CLASSIFIER_USE_LABELLED_DOCUMENTS the centroid of the stored
+    embeddings of documents already in that category is blended in.
+    """
+    labels = [label for label in CATEGORIES if label != "Unknown"]
+    prototypes = _normalize(np.asarray(embedder.encode(labels), dtype=np.float32))
+
+    if settings.CLASSIFIER_USE_LABELLED_DOCUMENTS:
+        for i, label in enumerate(labels):
+            rows = DocumentEmbedding.objects.filter(
+                document__category=category_from_label(label)
+            ).values_list("vector", flat=True)
+            vectors = decode_matrix(rows)
+            if len(vectors):
+                centroid = _normalize(np.mean(vectors, axis=0))
+                prototypes[i] = _normalize(prototypes[i] + centroid)
+
+    return labels, prototypes
+
+
+def get_prototypes():
+    global _prototypes
+    if _prototypes is None:
+        with _prototypes_lock:
+            if _prototypes is None:
+                _prototypes = build_prototypes()
+    return _prototypes
+
+
+def reset_prototypes():
+    """Drop cached prototypes, e.g. after relabelling documents."""
+    global _prototypes
+    with _prototypes_lock:
+        _prototypes = None
+
+
+def prototype_scores(vectors):
+    """Labels, and the cosine of each document vector to each prototype."""
+    labels, prototypes = get_prototypes()
+    scores = _normalize(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+    return labels, scores @ prototypes.T
+
+
+def classify_by_embedding(vectors):
+    """
+    Score document vectors against the category prototypes. Returns a list of
+    (label, confident) pairs; ``confident`` is False when the top-two margin
+    is below CLASSIFIER_MARGIN, or when even the best prototype scores below
+    CLASSIFIER_MIN_SCORE (the document may belong to no category).
+    """
+    labels, scores = prototype_scores(vectors)
+
+    top_two = np.argsort(-scores, axis=1)[:, :2]
+    results = []
+    for row, (best, second) in zip(scores, top_two):
+        margin = row[best] - row[second]
+        confident = (
+            margin >= settings.CLASSIFIER_MARGIN
+            and row[best] >= settings.CLASSIFIER_MIN_SCORE
+        )
+        results.append((labels[best], confident))
+    return results
+
+
+def classify_documents(texts, vectors, batch_size=8, mode=None):
+    """
+    Categories for a batch of documents. In "embedding" mode only documents
+    whose embedding is ambiguous go through the zero-shot pipeline, as one
+    batched call; in "zero-shot" mode every document does.
+    """
+    mode = mode or settings.CLASSIFIER_MODE
+    if mode == "embedding":
+        results = classify_by_embedding(vectors)
+    else:
+        results = [(None, False)] * len(texts)
+
+    labels = [label for label, _ in results]
+    fallback = [i for i, (_, confident) in enumerate(results) if not confident]
+    if fallback:
+        classifications = classifier(
+            [texts[i] for i in fallback],
+            candidate_labels=CATEGORIES,
+            batch_size=batch_size,
+        )
+        if isinstance(classifications, dict):
+            classifications = [classifications]
+        for i, classification in zip(fallback, classifications):
+            labels[i] = classification["labels"][0]
+
+    return [category_from_label(label) for label in labels]
+
+
+def classify_document(text, vector, mode=None):
+    return classify_documents([text], [vector], mode=mode)[0]
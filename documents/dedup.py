@@ -0,0 +1,71 @@
+from .lexical import copy_terms
+from .models import Document, DocumentChunk, DocumentEmbedding, DocumentTerm
+
+# Fields produced by the NLP pipeline that an identical upload can reuse.
+PROCESSED_FIELDS = [
+    "title",
+    "author",
+    "date",
+    "summary",
+    "entities",
+    "category",
+    "file_type",
+    "token_count",
+]
+
+
+def find_duplicate(content_hash, exclude_id=None):
+    """
+    Return the oldest fully processed document with the same content hash, or
+    None. ``content_hash`` is indexed, so this is a single index lookup.
+    """
+    if not content_hash:
+        return None
+    return (
+        Document.objects.filter(content_hash=content_hash, embedding__isnull=False)
+        .exclude(id=exclude_id)
+        .select_related("embedding")
+        .order_by("id")
+        .first()
+    )
+
+
+def reuse_processed_document(source, instance):
+    """
+    Copy the pipeline results (metadata, category, embedding, chunk vectors
+    and keyword postings) of ``source`` onto ``instance`` without running any
+    model.
+    """
+    for field in PROCESSED_FIELDS:
+        setattr(instance, field, getattr(source, field))
+    instance.duplicate_of = source
+    instance.save()
+
+    DocumentEmbedding.objects.update_or_create(
+        document=instance, defaults={"vector": source.embedding.vector}
+    )
+    DocumentChunk.objects.filter(document=instance).delete()
+    DocumentChunk.objects.bulk_create(
+        [
+            DocumentChunk(
+                document=instance,
+                index=chunk.index,
+                text=chunk.text,
+                vector=chunk.vector,
+            )
+            for chunk in source.chunks.all()
+        ]
+    )
+    DocumentTerm.objects.filter(document=instance).delete()
+    copy_terms([(source, instance)])
+
+
+def dedup_stats():
+    """Hit rate of the content-hash cache over all hashed documents."""
+    hashed = Document.objects.exclude(content_hash__isnull=True).count()
+    hits = Document.objects.filter(duplicate_of__isnull=False).count()
+    return {
+        "hashed_documents": hashed,
+        "duplicate_hits": hits,
+        "hit_rate": round(hits / hashed, 4) if hashed else 0.0,
+    }
@@ -0,0 +1,300 @@
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import DocumentEmbedding
+from .store import EmbeddingStore
+from .vectors import decode_vector, normalize
+
+
+def _top_k(scores, ids, k):
+    """Best ``k`` (id, score) pairs by score, then id, via a partial sort."""
+    if k is not None and k < len(scores):
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        keep = np.flatnonzero(scores >= kth)
+        scores, ids = scores[keep], ids[keep]
+    order = np.lexsort((ids, -scores))[:k]
+    return [(int(ids[i]), float(scores[i])) for i in order]
+
+
+def _shortlist(scores, ids, k):
+    """The ``k`` best (scores, ids), plus any row tied with the k-th best."""
+    if k is not None and k < len(scores):
+        # Ties are kept so tie-breaking by document id stays exact.
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        keep = np.flatnonzero(scores >= kth)
+        return scores[keep], ids[keep]
+    return scores, ids
+
+
+class _Partition:
+    """Store rows of one category's documents, in a contiguous growable array."""
+
+    def __init__(self):
+        self.store_rows = np.empty(16, dtype=np.int64)
+        self.ids = np.empty(16, dtype=np.int64)
+        self.size = 0
+        self.rows = {}  # document id -> row
+
+    def put(self, document_id, store_row):
+        row = self.rows.get(document_id)
+        if row is None:
+            if self.size == len(self.ids):
+                capacity = 2 * len(self.ids)
+                self.store_rows = np.resize(self.store_rows, capacity)
+                self.ids = np.resize(self.ids, capacity)
+            row = self.size
+            self.size += 1
+            self.rows[document_id] = row
+        self.store_rows[row] = store_row
+        self.ids[row] = document_id
+
+    def drop(self, document_id):
+        row = self.rows.pop(document_id, None)
+        if row is None:
+            return
+        last = self.size - 1
+        if row != last:
+            # Keep rows contiguous by moving the last one into the hole.
+            self.store_rows[row] = self.store_rows[last]
+            self.ids[row] = self.ids[last]
+            self.rows[int(self.ids[row])] = row
+        self.size = last
+
+    def candidates(self, matrix, query, k):
+        """(scores, ids) of every row that can be in the top ``k``."""
+        # Rounded so identical vectors tie exactly whatever BLAS blocking does.
+        scores = np.round(matrix[self.store_rows[: self.size]] @ query, 6)
+        return _shortlist(scores, self.ids[: self.size], k)
+
+    def candidates_many(self, matrix, queries, k):
+        """``candidates`` for each row of ``queries``, scored in one product."""
+        scores = matrix[self.store_rows[: self.size]] @ queries.T
+        np.round(scores, 6, out=scores)
+        ids = self.ids[: self.size]
+        return [_shortlist(column, ids, k) for column in scores.T]
+
+
+class VectorIndex:
+    """
+    Search over all DocumentEmbedding vectors, partitioned by document
+    category so role-filtered searches only touch their category.
+
+    The vectors themselves live in the memory-mapped EmbeddingStore, whose
+    pages every server process shares; each process only keeps which store
+    row holds each document and its category. Vectors are normalized, so a
+    query is one matrix-vector product per partition plus a partial sort.
+    Results are ordered by score and then by document id, like every other
+    search path, so ties come out in a stable order that cursors can resume.
+
+    The store is appended to by the save/delete signals of whichever process
+    writes an embedding. At most every VECTOR_INDEX_SYNC_INTERVAL seconds the
+    index maps new store rows and checks the table for rows written elsewhere
+    (bulk commands, queryset updates); embeddings missing from the store or
+    older there than in the table are copied into it.
+    """
+
+    def __init__(self, store=None):
+        self._lock = threading.RLock()
+        self.store = store or EmbeddingStore()
+        self._partitions = {}  # category -> _Partition
+        self._categories = {}  # document id -> category
+        self._meta = {}  # document id -> (category, updated_at)
+        self._fingerprint = None
+        self._latest = None
+        self._synced_at = None
+        self.loaded = False
+
+    def _put(self, document_id, category, store_row):
+        old = self._categories.get(document_id)
+        if old is not None and old != category:
+            self._partitions[old].drop(document_id)
+        if category not in self._partitions:
+            self._partitions[category] = _Partition()
+        self._partitions[category].put(document_id, store_row)
+        self._categories[document_id] = category
+
+    def _drop(self, document_id):
+        category = self._categories.pop(document_id, None)
+        if category is not None:
+            self._partitions[category].drop(document_id)
+
+    def _resolve(self, document_ids):
+        """Re-point documents at their current store row, or drop them."""
+        for document_id in document_ids:
+            meta = self._meta.get(document_id)
+            stored = self.store.live.get(document_id)
+            if meta is None or stored is None:
+                self._drop(document_id)
+            else:
+                self._put(document_id, meta[0], stored[0])
+
+    def _refresh_store(self):
+        reset, touched = self.store.refresh()
+        if reset:
+            self._partitions, self._categories = {}, {}
+            self._resolve(list(self._meta))
+            self._backfill(list(self._meta))
+        else:
+            self._resolve(list(touched))
+
+    def _backfill(self, document_ids):
+        """Copy embeddings the store lacks (or has older copies of) into it."""
+        stale = [
+            document_id
+            for document_id in document_ids
+            if document_id in self._meta
+            and self.store.live.get(document_id, (None, -1.0))[1]
+            < self._meta[document_id][1].timestamp()
+        ]
+        for start in range(0, len(stale), 1000):
+            rows = DocumentEmbedding.objects.filter(
+                document_id__in=stale[start : start + 1000]
+            ).values_list("document_id", "updated_at", "vector")
+            self.store.append(
+                (document_id, updated_at, decode_vector(vector))
+                for document_id, updated_at, vector in rows
+            )
+        if stale:
+            self._refresh_store()
+
+    def _rows(self, queryset):
+        return queryset.values_list("document_id", "document__category", "updated_at")
+
+    def load(self):
+        with self._lock:
+            self._meta, self._latest = {}, None
+            for document_id, category, updated_at in self._rows(
+                DocumentEmbedding.objects.all()
+            ).iterator():
+                self._meta[document_id] = (category, updated_at)
+                if self._latest is None or updated_at > self._latest:
+                    self._latest = updated_at
+            self._partitions, self._categories = {}, {}
+            self.store.refresh()
+            self._resolve(list(self._meta))
+            self._backfill(list(self._meta))
+            self._fingerprint = (len(self._meta), self._latest)
+            self._synced_at = time.monotonic()
+            self.loaded = True
+
+    def sync(self, force=False):
+        """Pick up embeddings written by other processes."""
+        if not self.loaded:
+            self.load()
+            return
+        interval = settings.VECTOR_INDEX_SYNC_INTERVAL
+        if not force and time.monotonic() - self._synced_at < interval:
+            return
+
+        with self._lock:
+            self._synced_at = time.monotonic()
+            self._refresh_store()
+            stats = DocumentEmbedding.objects.aggregate(
+                count=Count("id"), latest=Max("updated_at")
+            )
+            if (stats["count"], stats["latest"]) == self._fingerprint:
+                return
+
+            changed = DocumentEmbedding.objects.all()
+            if self._latest is not None:
+                changed = changed.filter(updated_at__gte=self._latest)
+            changed_ids = []
+            for document_id, category, updated_at in self._rows(changed):
+                self._meta[document_id] = (category, updated_at)
+                changed_ids.append(document_id)
+            self._latest = stats["latest"]
+
+            if len(self._meta) != stats["count"]:
+                # Rows were deleted elsewhere; reloading the ids is simplest.
+                self.load()
+            else:
+                self._resolve(changed_ids)
+                self._backfill(changed_ids)
+                self._fingerprint = (stats["count"], stats["latest"])
+
+    def upsert(self, embedding):
+        vector = decode_vector(embedding.vector)
+        self.store.append([(embedding.document_id, embedding.updated_at, vector)])
+        if not self.loaded:
+            return  # the first search loads everything from the database
+        with self._lock:
+            self._meta[embedding.document_id] = (
+                embedding.document.category,
+                embedding.updated_at,
+            )
+            self._refresh_store()
+
+    def set_category(self, document_id, category):
+        with self._lock:
+            meta = self._meta.get(document_id)
+            if meta is None or meta[0] == category:
+                return
+            self._meta[document_id] = (category, meta[1])
+            self._resolve([document_id])
+
+    def remove(self, document_id):
+        self.store.append([(document_id, timezone.now(), None)])
+        with self._lock:
+            self._meta.pop(document_id, None)
+            self._drop(document_id)
+
+    def search(self, query_vec, categories=None, k=5):
+        """
+        Top ``k`` (document_id, score) pairs, best first, restricted to
+        ``categories`` (None searches every partition). ``k=None`` returns
+        every match, sorted.
+        """
+        self.sync()
+        query = normalize(query_vec)
+        with self._lock:
+            names = self._partitions if categories is None else categories
+            parts = [
+                self._partitions[name].candidates(self.store.matrix, query, k)
+                for name in names
+                if name in self._partitions and self._partitions[name].size
+            ]
+            if not parts:
+                return []
+            scores, ids = (np.concatenate(column) for column in zip(*parts))
+
+        return _top_k(scores, ids, k)
+
+    def search_many(self, query_vecs, categories=None, k=5):
+        """
+        ``search`` for several queries at once: a block of
+        VECTOR_INDEX_QUERY_BLOCK queries is scored against a partition in one
+        matrix product, so memory stays bounded by the block, not by the
+        number of queries. Returns one hit list per row of ``query_vecs``.
+        """
+        self.sync()
+        queries = np.stack([normalize(query_vec) for query_vec in query_vecs])
+        block = settings.VECTOR_INDEX_QUERY_BLOCK
+        results = []
+        with self._lock:
+            names = self._partitions if categories is None else categories
+            partitions = [
+                self._partitions[name]
+                for name in names
+                if name in self._partitions and self._partitions[name].size
+            ]
+            if not partitions:
+                return [[] for _ in queries]
+            for start in range(0, len(queries), block):
+                parts = [
+                    partition.candidates_many(
+                        self.store.matrix, queries[start : start + block], k
+                    )
+                    for partition in partitions
+                ]
+                for per_query in zip(*parts):
+                    scores, ids = (np.concatenate(column) for column in zip(*per_query))
+                    results.append(_top_k(scores, ids, k))
+        return results
+
+
+vector_index = VectorIndex()
@@ -0,0 +1,121 @@
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import IngestionJob
+
+
+def worker_name():
+    """Identify this worker process in IngestionJob.worker."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_next_job(worker=None):
+    """
+    Atomically move the oldest queued job to "running" and return it.
+
+    The claim is a conditional UPDATE (status must still be "queued"), so two
+    workers polling the same table can never run the same job. This works on
+    SQLite as well as on databases with row locking.
+    """
+    worker = worker or worker_name()
+    while True:
+        job = (
+            IngestionJob.objects.filter(status="queued")
+            .order_by("created_at", "id")
+            .first()
+        )
+        if job is None:
+            return None
+
+        now = timezone.now()
+        claimed = IngestionJob.objects.filter(id=job.id, status="queued").update(
+            status="running",
+            worker=worker,
+            started_at=now,
+            heartbeat_at=now,
+            progress=0,
+            stage="claimed",
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+        # Another worker won the race, try the next one.
+
+
+def requeue_stale_jobs(stale_after=None):
+    """
+    Put "running" jobs whose worker died back on the queue, or mark them
+    failed once they have used up INGESTION_MAX_ATTEMPTS (a document that
+    kills its worker every time must not be retried forever). A job is stale
+    when its worker has not reported progress for ``stale_after`` seconds,
+    so slow jobs that are still running are left alone.
+    Returns the number of jobs requeued.
+    """
+    stale_after = stale_after or settings.INGESTION_STALE_AFTER
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    stale = IngestionJob.objects.filter(status="running").filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    )
+    stale.filter(attempts__gte=settings.INGESTION_MAX_ATTEMPTS).update(
+        status="failed",
+        stage="failed",
+        worker="",
+        error="Worker died while running the job",
+        finished_at=timezone.now(),
+    )
+    return stale.filter(attempts__lt=settings.INGESTION_MAX_ATTEMPTS).update(
+        status="queued", stage="requeued", worker=""
+    )
+
+
+def run_job(job):
+    """Run the ingestion pipeline for a claimed job and record the outcome."""
+    from .signals import ingest_document
+
+    def progress(percent, stage):
+        IngestionJob.objects.filter(id=job.id).update(
+            progress=percent, stage=stage, heartbeat_at=timezone.now()
+        )
+
+    job.attempts += 1
+    IngestionJob.objects.filter(id=job.id).update(attempts=job.attempts)
+
+    try:
+        ingest_document(job.document, progress=progress)
+    except Exception as e:
+        print(f"Ingestion job {job.id} failed: {e}")
+        retry = job.attempts < settings.INGESTION_MAX_ATTEMPTS
+        IngestionJob.objects.filter(id=job.id).update(
+            status="queued" if retry else "failed",
+            stage="retrying" if retry else "failed",
+            error=traceback.format_exc(),
+            finished_at=None if retry else timezone.now(),
+        )
+        return False
+
+    IngestionJob.objects.filter(id=job.id).update(
+        status="done",
+        progress=100,
+        stage="done",
+        error="",
+        finished_at=timezone.now(),
+    )
+    return True
+
+
+def run_pending_jobs(max_jobs=None, worker=None):
+    """Drain the queue in this process. Returns the number of jobs processed."""
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        job = claim_next_job(worker)
+        if job is None:
+            break
+        run_job(job)
+        processed += 1
+    return processed
@@ -0,0 +1,131 @@
+"""
+Keyword search: a BM25-scored inverted index kept in the DocumentTerm table.
+
+Postings are written once per document at ingest. A query reads only the
+postings of its own terms (an index range scan per term) and scores them in
+one numpy pass, so exact tokens such as invoice numbers and names are found
+without touching any vector.
+"""
+
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+from django.db.models import Avg, Count
+
+from .models import Document, DocumentTerm
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60  # rank offset of reciprocal rank fusion (the usual constant)
+TERM_RE = re.compile(r"[^\W_]+")
+MAX_TERM_LENGTH = DocumentTerm._meta.get_field("term").max_length
+
+
+def tokenize(text):
+    """Lower-cased alphanumeric tokens; "INV-2024-001" -> inv, 2024, 001."""
+    return [token[:MAX_TERM_LENGTH] for token in TERM_RE.findall(text.lower())]
+
+
+def index_terms(items):
+    """
+    (Re)write the postings of several documents at once. ``items`` is a list
+    of (document, texts) pairs; the texts (title, summary, full text, any of
+    them None) are indexed together.
+    """
+    postings = []
+    for document, texts in items:
+        counts = Counter(token for text in texts if text for token in tokenize(text))
+        postings += [
+            DocumentTerm(document=document, term=term, frequency=frequency)
+            for term, frequency in counts.items()
+        ]
+        document.token_count = sum(counts.values())
+
+    documents = [document for document, _ in items]
+    DocumentTerm.objects.filter(document__in=documents).delete()
+    DocumentTerm.objects.bulk_create(postings, batch_size=1000)
+    Document.objects.bulk_update(documents, ["token_count"])
+
+
+def copy_terms(pairs):
+    """Give each target the postings of its source, for (source, target) pairs."""
+    targets = defaultdict(list)
+    for source, target in pairs:
+        targets[source.id].append(target)
+    rows = DocumentTerm.objects.filter(document_id__in=targets).values_list(
+        "document_id", "term", "frequency"
+    )
+    DocumentTerm.objects.bulk_create(
+        [
+            DocumentTerm(document=target, term=term, frequency=frequency)
+            for document_id, term, frequency in rows
+            for target in targets[document_id]
+        ],
+        batch_size=1000,
+    )
+
+
+def bm25_search(query, categories=None, k=5):
+    """
+    Top ``k`` (document_id, score) pairs by BM25 over title, summary and
+    text, restricted to ``categories`` (None for all). ``k=None`` returns
+    every matching document, sorted.
+    """
+    terms = sorted(set(tokenize(query)))
+    if not terms:
+        return []
+
+    corpus = Document.objects.filter(token_count__gt=0).aggregate(
+        n=Count("id"), avgdl=Avg("token_count")
+    )
+    df = dict(
+        DocumentTerm.objects.filter(term__in=terms)
+        .values("term")
+        .annotate(df=Count("id"))
+        .values_list("term", "df")
+    )
+    postings = DocumentTerm.objects.filter(term__in=terms)
+    if categories is not None:
+        postings = postings.filter(document__category__in=categories)
+    rows = list(
+        postings.values_list(
+            "document_id", "term", "frequency", "document__token_count"
+        )
+    )
+    if not rows:
+        return []
+
+    doc_ids, row_terms, tf, length = zip(*rows)
+    doc_ids = np.array(doc_ids, dtype=np.int64)
+    tf = np.array(tf, dtype=np.float64)
+    length = np.array(length, dtype=np.float64)
+    n_docs = np.array([df[term] for term in row_terms], dtype=np.float64)
+
+    idf = np.log1p((corpus["n"] - n_docs + 0.5) / (n_docs + 0.5))
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / corpus["avgdl"])
+    contributions = idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+    unique_ids, inverse = np.unique(doc_ids, return_inverse=True)
+    scores = np.bincount(inverse, weights=contributions)
+    order = np.lexsort((unique_ids, -scores))[:k]
+    return [(int(unique_ids[i]), float(scores[i])) for i in order]
+
+
+def fuse_rankings(rankings, k=5):
+    """
+    Reciprocal rank fusion of several best-first (document_id, score) lists:
+    each list contributes 1 / (RRF_K + rank) to a document's score, so no
+    score normalisation between BM25 and cosine is needed.
+    """
+    rankings = [ranking for ranking in rankings if ranking]
+    if not rankings:
+        return []
+    ids = np.concatenate(
+        [np.array([doc_id for doc_id, _ in ranking]) for ranking in rankings]
+    )
+    ranks = np.concatenate([np.arange(1, len(ranking) + 1) for ranking in rankings])
+    unique_ids, inverse = np.unique(ids, return_inverse=True)
+    scores = np.bincount(inverse, weights=1.0 / (RRF_K + ranks))
+    order = np.lexsort((unique_ids, -scores))[:k]
+    return [(int(unique_ids[i]), float(scores[i])) for i in order]
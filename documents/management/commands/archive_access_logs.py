@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from documents.rollups import archive, roll_up
+
+
+class Command(BaseCommand):
+    help = (
+        "Move access log events older than the retention period into a "
+        "gzipped JSON-lines file and delete them from the database. Events are "
+        "rolled up first, so analytics keep counting them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.ACCESS_LOG_RETENTION_DAYS,
+            help="Keep this many days of raw events.",
+        )
+
+    def handle(self, *args, **options):
+        roll_up()
+        before = timezone.now() - timedelta(days=options["days"])
+        archived, path = archive(before)
+        if path:
+            self.stdout.write(f"Archived {archived} access log event(s) to {path}")
+        else:
+            self.stdout.write(f"No access log events before {before:%Y-%m-%d}.")
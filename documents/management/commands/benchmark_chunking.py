@@ -0,0 +1,57 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.models import Document
+from documents.signals import chunk_text, embedder, extract_text
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure chunk embedding throughput for combinations of chunk size and "
+        "embedder batch size, to tune CHUNK_SIZE_WORDS and EMBEDDING_BATCH_SIZE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-sizes", type=int, nargs="+", default=[100, 200, 400]
+        )
+        parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32, 64])
+        parser.add_argument(
+            "--overlap", type=int, default=None, help="Overlap in words."
+        )
+        parser.add_argument("--limit", type=int, default=20, help="Documents to use.")
+
+    def handle(self, *args, **options):
+        texts = []
+        for doc in Document.objects.exclude(file_type="other").order_by("id"):
+            if doc.file and os.path.exists(doc.file.path):
+                text = extract_text(doc.file.path, doc.file_type)
+                if text:
+                    texts.append(text)
+            if len(texts) >= options["limit"]:
+                break
+        if not texts:
+            raise CommandError("No documents with extractable text to benchmark.")
+
+        embedder.encode(["warm up"])
+        self.stdout.write(
+            f"{len(texts)} document(s), {sum(len(t.split()) for t in texts)} words"
+        )
+        self.stdout.write(
+            f"{'chunk':>6} {'batch':>6} {'chunks':>7} {'seconds':>8} {'chunks/s':>9}"
+        )
+        for size in options["chunk_sizes"]:
+            overlap = options["overlap"]
+            if overlap is None:
+                overlap = size // 5
+            chunks = [c for text in texts for c in chunk_text(text, size, overlap)]
+            for batch_size in options["batch_sizes"]:
+                started = time.perf_counter()
+                embedder.encode(chunks, batch_size=batch_size)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"{size:>6} {batch_size:>6} {len(chunks):>7} "
+                    f"{elapsed:>8.2f} {len(chunks) / elapsed:>9.1f}"
+                )
@@ -0,0 +1,118 @@
+import os
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.classification import (
+    classify_by_embedding,
+    classify_document,
+    prototype_scores,
+)
+from documents.models import Document
+from documents.signals import (
+    detect_file_type,
+    embedder,
+    embedding_text,
+    extract_metadata,
+    extract_text,
+    summarize_text,
+)
+
+
+def describe(latencies):
+    latencies = np.asarray(latencies) * 1000
+    return (
+        f"mean {latencies.mean():8.1f} ms  "
+        f"p50 {np.percentile(latencies, 50):8.1f} ms  "
+        f"p95 {np.percentile(latencies, 95):8.1f} ms"
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare latency and agreement of the embedding-prototype classifier "
+        "against the zero-shot BART classifier."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--directory",
+            help="Benchmark files in this folder instead of stored documents.",
+        )
+        parser.add_argument("--limit", type=int, default=50)
+
+    def load_samples(self, options):
+        """(text, embedding input) pairs from a folder or from stored documents."""
+        samples = []
+        if options["directory"]:
+            for root, _, files in os.walk(options["directory"]):
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    file_type = detect_file_type(path)
+                    text = extract_text(path, file_type) if file_type != "other" else ""
+                    if text:
+                        title = extract_metadata(text)[0]
+                        samples.append(
+                            (text, embedding_text(title, summarize_text(text), text))
+                        )
+                    if len(samples) >= options["limit"]:
+                        return samples
+            return samples
+
+        for doc in Document.objects.exclude(file_type="other").order_by("id"):
+            if not doc.file or not os.path.exists(doc.file.path):
+                continue
+            text = extract_text(doc.file.path, doc.file_type)
+            if text:
+                samples.append((text, embedding_text(doc.title, doc.summary, text)))
+            if len(samples) >= options["limit"]:
+                break
+        return samples
+
+    def handle(self, *args, **options):
+        samples = self.load_samples(options)
+        if not samples:
+            raise CommandError("No documents with extractable text to benchmark.")
+        self.stdout.write(f"Benchmarking {len(samples)} document(s)")
+
+        vectors = embedder.encode([embedding_input for _, embedding_input in samples])
+        # Load both models before timing.
+        classify_document(samples[0][0], vectors[0], mode="zero-shot")
+        classify_document(samples[0][0], vectors[0], mode="embedding")
+
+        baseline, baseline_latency = [], []
+        fast, fast_latency = [], []
+        for (text, _), vector in zip(samples, vectors):
+            started = time.perf_counter()
+            baseline.append(classify_document(text, vector, mode="zero-shot"))
+            baseline_latency.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            fast.append(classify_document(text, vector, mode="embedding"))
+            fast_latency.append(time.perf_counter() - started)
+
+        fallbacks = sum(
+            1 for _, confident in classify_by_embedding(vectors) if not confident
+        )
+        best_scores = prototype_scores(vectors)[1].max(axis=1)
+        low_scores = int((best_scores < settings.CLASSIFIER_MIN_SCORE).sum())
+        agreement = sum(a == b for a, b in zip(baseline, fast)) / len(samples)
+        # Documents zero-shot calls Unknown must stay Unknown: the category
+        # decides who can see them.
+        unknown = [b for a, b in zip(baseline, fast) if a == "Unknown"]
+        kept_unknown = sum(b == "Unknown" for b in unknown)
+
+        self.stdout.write(f"zero-shot  {describe(baseline_latency)}")
+        self.stdout.write(f"embedding  {describe(fast_latency)}")
+        self.stdout.write(
+            f"speedup {np.mean(baseline_latency) / np.mean(fast_latency):.1f}x, "
+            f"zero-shot fallbacks {fallbacks}/{len(samples)} "
+            f"({low_scores} below CLASSIFIER_MIN_SCORE "
+            f"{settings.CLASSIFIER_MIN_SCORE})"
+        )
+        self.stdout.write(
+            f"Unknown kept {kept_unknown}/{len(unknown)} of zero-shot's Unknowns"
+        )
+        self.stdout.write(self.style.SUCCESS(f"agreement {agreement:.1%}"))
@@ -0,0 +1,103 @@
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from documents.index import VectorIndex
+from documents.lexical import bm25_search, fuse_rankings, index_terms
+from documents.models import Document, DocumentEmbedding
+from documents.store import EmbeddingStore
+from documents.vectors import decode_vector, encode_vector
+from users.models import User
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the old per-row cosine loop with vector, BM25 and hybrid "
+        "search on a synthetic corpus. Everything is written inside a "
+        "transaction that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--docs", type=int, default=2000)
+        parser.add_argument("--dim", type=int, default=384)  # all-MiniLM-L6-v2
+        parser.add_argument("--words", type=int, default=150, help="Words per doc.")
+        parser.add_argument("--queries", type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        rng = np.random.default_rng(0)
+        vocabulary = np.array([f"w{i}" for i in range(20000)])
+        categories = ["Finance", "HR", "Legal", "Tech"]
+        user = User.objects.create_user("benchmark-search", role="HR")
+
+        documents = Document.objects.bulk_create(
+            [
+                Document(uploader=user, file="bench.txt", category=categories[i % 4])
+                for i in range(options["docs"])
+            ]
+        )
+        vectors = rng.standard_normal((len(documents), options["dim"]))
+        DocumentEmbedding.objects.bulk_create(
+            [
+                DocumentEmbedding(document=doc, vector=encode_vector(vec))
+                for doc, vec in zip(documents, vectors)
+            ]
+        )
+        words = rng.zipf(1.3, (len(documents), options["words"])) % len(vocabulary)
+        index_terms(
+            [(doc, [" ".join(vocabulary[row])]) for doc, row in zip(documents, words)]
+        )
+
+        index = VectorIndex(EmbeddingStore(f"{tempfile.mkdtemp()}/bench.embeddings"))
+        index.load()
+        queries = [
+            (rng.standard_normal(options["dim"]), " ".join(vocabulary[row[:3]]))
+            for row in words[rng.choice(len(documents), options["queries"])]
+        ]
+
+        def per_row_loop(query_vec, text):
+            results = []
+            for emb in DocumentEmbedding.objects.select_related("document"):
+                if emb.document.category != "HR":
+                    continue
+                vec = decode_vector(emb.vector)
+                score = np.dot(query_vec, vec) / (
+                    np.linalg.norm(query_vec) * np.linalg.norm(vec)
+                )
+                results.append((score, emb.document))
+            results.sort(key=lambda x: x[0], reverse=True)
+            return results[:5]
+
+        runs = {
+            "per-row loop": per_row_loop,
+            "vector": lambda vec, text: index.search(vec, ["HR"], k=5),
+            "bm25": lambda vec, text: bm25_search(text, ["HR"], k=5),
+            "hybrid": lambda vec, text: fuse_rankings(
+                [index.search(vec, ["HR"], k=100), bm25_search(text, ["HR"], k=100)],
+                k=5,
+            ),
+        }
+        self.stdout.write(
+            f"{len(documents)} documents, {options['words']} words each\n"
+            f"{'search':<14} {'ms/query':>9}"
+        )
+        for name, search in runs.items():
+            started = time.perf_counter()
+            for query_vec, text in queries:
+                search(query_vec, text)
+            elapsed = (time.perf_counter() - started) * 1000 / len(queries)
+            self.stdout.write(f"{name:<14} {elapsed:>9.2f}")
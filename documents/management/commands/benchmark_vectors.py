@@ -0,0 +1,56 @@
+import pickle
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from documents.vectors import decode_matrix, decode_vector, encode_vector
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare storage size and decode time of pickled numpy embeddings with "
+        "the binary float32/float16 vector format."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=10000)
+        parser.add_argument("--dim", type=int, default=384)  # all-MiniLM-L6-v2
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((options["count"], options["dim"]))
+        vectors = vectors.astype(np.float32)
+
+        formats = {
+            "pickle": (
+                [pickle.dumps(vec) for vec in vectors],
+                lambda blobs: np.stack([pickle.loads(blob) for blob in blobs]),
+            ),
+            "float32": (
+                [encode_vector(vec, "float32") for vec in vectors],
+                decode_matrix,
+            ),
+            "float16": (
+                [encode_vector(vec, "float16") for vec in vectors],
+                decode_matrix,
+            ),
+            "float32/row": (
+                [encode_vector(vec, "float32") for vec in vectors],
+                lambda blobs: [decode_vector(blob) for blob in blobs],
+            ),
+        }
+
+        self.stdout.write(
+            f"{options['count']} vectors x {options['dim']} dims\n"
+            f"{'format':<12} {'bytes/vec':>10} {'total MB':>9} {'decode ms':>10}"
+        )
+        for name, (blobs, decode) in formats.items():
+            started = time.perf_counter()
+            decode(blobs)
+            elapsed = (time.perf_counter() - started) * 1000
+            size = sum(len(blob) for blob in blobs)
+            self.stdout.write(
+                f"{name:<12} {size / len(blobs):>10.0f} "
+                f"{size / 2**20:>9.2f} {elapsed:>10.1f}"
+            )
@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.ann import build_from_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the approximate nearest-neighbour (IVF) index from all stored "
+        "document embeddings and write it to ANN_INDEX_PATH. Running servers "
+        "pick up the new file on their next search."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lists",
+            type=int,
+            default=None,
+            help="Number of k-means lists (default: 4 * sqrt(vectors)).",
+        )
+        parser.add_argument("--iterations", type=int, default=10)
+        parser.add_argument("--path", default=None, help="Output file.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        index = build_from_database(options["lists"], options["iterations"])
+        if index is None:
+            raise CommandError("No document embeddings to index.")
+        path = options["path"] or str(settings.ANN_INDEX_PATH)
+        index.save(path)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed {len(index)} vectors in {len(index.centroids)} lists "
+                f"({time.perf_counter() - started:.1f}s) -> {path}"
+            )
+        )
@@ -0,0 +1,40 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from documents.lexical import index_terms
+from documents.models import Document
+from documents.signals import extract_text
+
+
+class Command(BaseCommand):
+    help = (
+        "Write BM25 keyword postings for documents ingested before keyword "
+        "search existed (or all documents with --all), re-extracting their text."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all", action="store_true", help="Reindex every document."
+        )
+        parser.add_argument("--batch-size", type=int, default=50)
+
+    def handle(self, *args, **options):
+        documents = Document.objects.exclude(file_type="other").order_by("id")
+        if not options["all"]:
+            documents = documents.filter(token_count=0)
+
+        indexed, batch = 0, []
+        for doc in documents.iterator():
+            text = ""
+            if doc.file and os.path.exists(doc.file.path):
+                text = extract_text(doc.file.path, doc.file_type)
+            batch.append((doc, [doc.title, doc.summary, text]))
+            if len(batch) >= options["batch_size"]:
+                index_terms(batch)
+                indexed, batch = indexed + len(batch), []
+        if batch:
+            index_terms(batch)
+            indexed += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} document(s)"))
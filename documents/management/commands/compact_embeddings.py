@@ -0,0 +1,47 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.index import vector_index
+from documents.models import DocumentEmbedding
+from documents.vectors import decode_vector
+
+
+class Command(BaseCommand):
+    help = (
+        "Rewrite the shared embedding store without the superseded rows of "
+        "re-embedded documents and the rows of deleted ones. Server processes "
+        "remap the new file on their next sync."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Recreate the store from the database instead.",
+        )
+
+    def handle(self, *args, **options):
+        store = vector_index.store
+        if options["rebuild"]:
+            items = [
+                (document_id, updated_at, decode_vector(vector))
+                for document_id, updated_at, vector in DocumentEmbedding.objects.values_list(
+                    "document_id", "updated_at", "vector"
+                ).order_by(
+                    "id"
+                )
+            ]
+            if not items:
+                raise CommandError("No document embeddings to store.")
+            store.rebuild(items, len(items[0][2]))
+            summary = f"Rebuilt with {len(items)} rows"
+        else:
+            keep = set(DocumentEmbedding.objects.values_list("document_id", flat=True))
+            before, after = store.compact(keep)
+            summary = f"Compacted {before} rows to {after}"
+
+        size = os.path.getsize(store.path) if os.path.exists(store.path) else 0
+        self.stdout.write(
+            self.style.SUCCESS(f"{summary} ({size / 2**20:.1f} MB) -> {store.path}")
+        )
@@ -0,0 +1,241 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.caches import bump_search_generation
+from documents.dedup import PROCESSED_FIELDS, find_duplicate
+from documents.lexical import copy_terms, index_terms
+from documents.models import Document, DocumentChunk, DocumentEmbedding, sha256_of
+from documents.classification import classify_documents
+from documents.signals import (
+    create_chunks,
+    detect_file_type,
+    embedder,
+    embedding_text,
+    extract_metadata,
+    extract_text,
+    serialize_embedding,
+    summarize_text,
+)
+from users.models import User
+
+
+def prepare_file(path):
+    """
+    CPU-bound, per-file part of the pipeline. Runs in a pool worker, so it
+    only returns plain picklable data.
+    """
+    file_type = detect_file_type(path)
+    text = extract_text(path, file_type)
+    if not text:
+        return {"path": path, "file_type": file_type, "text": ""}
+
+    title, author, date, entities = extract_metadata(text)
+    summary = summarize_text(text)
+    return {
+        "path": path,
+        "file_type": file_type,
+        "text": text,
+        "title": title,
+        "author": author,
+        "date": date,
+        "entities": entities,
+        "summary": summary,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-ingest every supported file in a directory: text extraction and "
+        "summarization run in a process pool, embeddings and classification "
+        "are batched, rows are written with bulk_create."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory", help="Folder to walk recursively.")
+        parser.add_argument(
+            "--user", required=True, help="Username recorded as the uploader."
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Process pool size (default: number of cores).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=32,
+            help="Documents per embedding/classification batch and bulk_create.",
+        )
+
+    def handle(self, *args, **options):
+        directory = options["directory"]
+        if not os.path.isdir(directory):
+            raise CommandError(f"{directory} is not a directory")
+        try:
+            uploader = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist")
+
+        paths = []
+        for root, _, files in os.walk(directory):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                if detect_file_type(path) != "other":
+                    paths.append(path)
+        if not paths:
+            self.stdout.write("No supported files found.")
+            return
+
+        self.stdout.write(
+            f"Ingesting {len(paths)} file(s) with {options['workers']} worker(s)"
+        )
+        started = time.perf_counter()
+        created = skipped = 0
+        batch = []
+
+        # Only content that has never been processed goes through the pool;
+        # repeats (in the database or within this folder) reuse its results.
+        self.hashes = {}
+        seen = set()
+        new_paths, duplicate_paths = [], []
+        for path in paths:
+            with open(path, "rb") as f:
+                digest = sha256_of(File(f))
+            if digest in seen or find_duplicate(digest):
+                duplicate_paths.append(path)
+            else:
+                new_paths.append(path)
+            seen.add(digest)
+            self.hashes[path] = digest
+
+        if new_paths:
+            with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+                chunksize = max(1, len(new_paths) // (options["workers"] * 4))
+                prepared_files = pool.map(prepare_file, new_paths, chunksize=chunksize)
+                for prepared in prepared_files:
+                    if not prepared["text"]:
+                        skipped += 1
+                        continue
+                    batch.append(prepared)
+                    if len(batch) >= options["batch_size"]:
+                        created += self.write_batch(batch, uploader, options)
+                        batch = []
+                if batch:
+                    created += self.write_batch(batch, uploader, options)
+
+        reused = self.write_duplicates(duplicate_paths, uploader)
+        skipped += len(duplicate_paths) - reused
+        created += reused
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Ingested {created} document(s) ({reused} deduplicated), "
+                f"skipped {skipped} empty file(s) "
+                f"in {elapsed:.2f}s ({created / elapsed:.2f} docs/sec)"
+            )
+        )
+
+    def store_file(self, path):
+        with open(path, "rb") as f:
+            return default_storage.save(os.path.basename(path), File(f))
+
+    def write_duplicates(self, paths, uploader):
+        """Create documents for repeated content by copying processed results."""
+        documents, sources = [], []
+        for path in paths:
+            source = find_duplicate(self.hashes[path])
+            if source is None:  # the original had no extractable text
+                continue
+            document = Document(
+                uploader=uploader,
+                file=self.store_file(path),
+                content_hash=self.hashes[path],
+                duplicate_of=source,
+            )
+            for field in PROCESSED_FIELDS:
+                setattr(document, field, getattr(source, field))
+            documents.append(document)
+            sources.append(source)
+
+        documents = Document.objects.bulk_create(documents)
+        DocumentEmbedding.objects.bulk_create(
+            [
+                DocumentEmbedding(document=doc, vector=source.embedding.vector)
+                for doc, source in zip(documents, sources)
+            ]
+        )
+        DocumentChunk.objects.bulk_create(
+            [
+                DocumentChunk(
+                    document=doc,
+                    index=chunk.index,
+                    text=chunk.text,
+                    vector=chunk.vector,
+                )
+                for doc, source in zip(documents, sources)
+                for chunk in source.chunks.all()
+            ]
+        )
+        copy_terms(zip(sources, documents))
+        bump_search_generation()  # bulk_create sends no signals
+        return len(documents)
+
+    def write_batch(self, batch, uploader, options):
+        texts = [item["text"] for item in batch]
+        vectors = embedder.encode(
+            [
+                embedding_text(item["title"], item["summary"], item["text"])
+                for item in batch
+            ],
+            batch_size=options["batch_size"],
+        )
+        categories = classify_documents(
+            texts, vectors, batch_size=options["batch_size"]
+        )
+
+        documents = []
+        for item, category in zip(batch, categories):
+            documents.append(
+                Document(
+                    title=item["title"],
+                    author=item["author"],
+                    date=item["date"],
+                    entities=item["entities"],
+                    summary=item["summary"],
+                    category=category,
+                    file_type=item["file_type"],
+                    uploader=uploader,
+                    file=self.store_file(item["path"]),
+                    content_hash=self.hashes[item["path"]],
+                )
+            )
+
+        # bulk_create skips post_save, so no IngestionJob is queued for these.
+        documents = Document.objects.bulk_create(documents)
+        DocumentEmbedding.objects.bulk_create(
+            [
+                DocumentEmbedding(document=doc, vector=serialize_embedding(vec))
+                for doc, vec in zip(documents, vectors)
+            ]
+        )
+        create_chunks(
+            [(doc, item["text"]) for doc, item in zip(documents, batch)],
+            batch_size=options["batch_size"],
+        )
+        index_terms(
+            [
+                (doc, [item["title"], item["summary"], item["text"]])
+                for doc, item in zip(documents, batch)
+            ]
+        )
+        # bulk_create sends no signals: invalidate cached searches here
+        bump_search_generation()
+        self.stdout.write(f"  wrote {len(documents)} document(s)")
+        return len(documents)
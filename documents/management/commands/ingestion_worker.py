@@ -0,0 +1,57 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from documents.jobs import claim_next_job, requeue_stale_jobs, run_job, worker_name
+
+
+class Command(BaseCommand):
+    help = "Claim queued IngestionJobs and run the document NLP pipeline."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit as soon as the queue is empty instead of polling.",
+        )
+        parser.add_argument(
+            "--max-jobs",
+            type=int,
+            default=None,
+            help="Stop after processing this many jobs.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.INGESTION_POLL_INTERVAL,
+            help="Seconds to sleep between polls when the queue is empty.",
+        )
+
+    def handle(self, *args, **options):
+        worker = worker_name()
+        processed = 0
+        self.stdout.write(f"Ingestion worker {worker} started")
+
+        while options["max_jobs"] is None or processed < options["max_jobs"]:
+            requeued = requeue_stale_jobs()
+            if requeued:
+                self.stdout.write(f"Requeued {requeued} stale job(s)")
+
+            job = claim_next_job(worker)
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+                continue
+
+            started = time.perf_counter()
+            ok = run_job(job)
+            elapsed = time.perf_counter() - started
+            processed += 1
+            self.stdout.write(
+                f"Job {job.id} (document {job.document_id}) "
+                f"{'done' if ok else 'failed'} in {elapsed:.2f}s"
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} job(s)"))
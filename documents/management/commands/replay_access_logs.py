@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from documents.audit import replay_journals
+
+
+class Command(BaseCommand):
+    help = (
+        "Insert access log events from journals left behind by server "
+        "processes that exited without flushing them (ACCESS_LOG_JOURNAL_DIR)."
+    )
+
+    def handle(self, *args, **options):
+        written = replay_journals()
+        self.stdout.write(f"Replayed {written} access log event(s).")
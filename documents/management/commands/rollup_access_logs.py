@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from documents.rollups import roll_up
+
+
+class Command(BaseCommand):
+    help = (
+        "Add access log events written since the last run to the hourly and "
+        "daily rollups read by the analytics endpoint. Run it from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50000)
+
+    def handle(self, *args, **options):
+        rolled = roll_up(options["batch_size"])
+        self.stdout.write(f"Rolled up {rolled} access log event(s).")
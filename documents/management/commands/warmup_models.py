@@ -0,0 +1,58 @@
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.registry import registry
+
+
+class Command(BaseCommand):
+    help = (
+        "Load the NLP/LLM models ahead of traffic and report how long each "
+        "takes. Models are otherwise loaded lazily on first use."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "models",
+            nargs="*",
+            help="Models to load (default: all registered).",
+        )
+        parser.add_argument(
+            "--measure-startup",
+            action="store_true",
+            help="Also time a cold `manage.py check` in a fresh process.",
+        )
+
+    def handle(self, *args, **options):
+        if options["measure_startup"]:
+            started = time.perf_counter()
+            subprocess.run(
+                [sys.executable, str(settings.BASE_DIR / "manage.py"), "check"],
+                check=True,
+                capture_output=True,
+            )
+            self.stdout.write(
+                f"Cold start (manage.py check): {time.perf_counter() - started:.2f}s"
+            )
+
+        names = options["models"] or registry.names()
+        unknown = set(names) - set(registry.names())
+        if unknown:
+            raise CommandError(
+                f"Unknown model(s): {', '.join(sorted(unknown))}. "
+                f"Registered: {', '.join(registry.names())}"
+            )
+
+        total = 0.0
+        for name in names:
+            started = time.perf_counter()
+            registry.get(name)
+            elapsed = time.perf_counter() - started
+            total += elapsed
+            self.stdout.write(f"{name:<12} {elapsed:8.2f}s")
+        self.stdout.write(
+            self.style.SUCCESS(f"Warmed up {len(names)} model(s) in {total:.2f}s")
+        )
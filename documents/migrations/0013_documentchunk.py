@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("documents", "0012_document_content_hash"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DocumentChunk",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("index", models.PositiveIntegerField()),
+                ("text", models.TextField()),
+                ("vector", models.BinaryField()),
+                (
+                    "document",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="chunks",
+                        to="documents.document",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["document", "index"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("document", "index"), name="unique_document_chunk"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Converts pickled numpy embeddings to the binary format of documents/vectors.py
+
+import pickle
+
+import numpy as np
+from django.db import migrations
+
+MAGIC = b"DV"
+VERSION = 1
+FLOAT32 = 1
+DTYPES = {1: "<f4", 2: "<f2"}  # header byte 3, as in documents/vectors.py
+
+
+def encode(vec):
+    # Frozen copy of documents.vectors.encode_vector (float32).
+    vec = np.asarray(vec, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vec)
+    if norm:
+        vec = vec / norm
+    return MAGIC + bytes([VERSION, FLOAT32]) + vec.astype("<f4").tobytes()
+
+
+def convert(model, to_binary, batch_size=500):
+    batch = []
+    for row in model.objects.only("id", "vector").iterator(chunk_size=batch_size):
+        blob = bytes(row.vector)
+        is_binary = blob[:2] == MAGIC
+        if to_binary and not is_binary:
+            row.vector = encode(pickle.loads(blob))
+        elif not to_binary and is_binary:
+            vec = np.frombuffer(blob, dtype=DTYPES[blob[3]], offset=4)
+            row.vector = pickle.dumps(vec.astype(np.float32))
+        else:
+            continue
+        batch.append(row)
+        if len(batch) >= batch_size:
+            model.objects.bulk_update(batch, ["vector"])
+            batch = []
+    if batch:
+        model.objects.bulk_update(batch, ["vector"])
+
+
+def forwards(apps, schema_editor):
+    for name in ["DocumentEmbedding", "DocumentChunk"]:
+        convert(apps.get_model("documents", name), to_binary=True)
+
+
+def backwards(apps, schema_editor):
+    for name in ["DocumentEmbedding", "DocumentChunk"]:
+        convert(apps.get_model("documents", name), to_binary=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("documents", "0013_documentchunk"),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
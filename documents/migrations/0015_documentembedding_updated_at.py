@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0014_encode_vectors'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentembedding',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 05:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("documents", "0016_documentterm"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="accesslog",
+            name="timestamp",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:40
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    # The default cache (CACHES in settings) is a database table shared by the
+    # web and worker processes; createcachetable skips tables that exist.
+    call_command("createcachetable", database=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("documents", "0018_accesslog_rollups"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,18 @@
+import hashlib
+
 from django.db import models
+from django.utils import timezone
 from users.models import User
 
 
+def sha256_of(file):
+    """SHA-256 hex digest of a Django File, read chunk by chunk."""
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
 class Document(models.Model):
     CATEGORY_CHOICES = [
         ("Finance", "Finance"),
@@ -35,17 +46,70 @@ class Document(models.Model):
     file = models.FileField(upload_to="")
     summary = models.TextField(blank=True, null=True)
     entities = models.JSONField(blank=True, null=True)  # store extracted entities
+    content_hash = models.CharField(max_length=64, blank=True, null=True, db_index=True)
+    duplicate_of = models.ForeignKey(
+        "self",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="duplicates",
+    )  # set when ingestion reused another document's results
+    token_count = models.PositiveIntegerField(default=0)  # indexed terms, for BM25
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return self.title or f"Document {self.id}"
 
+    def save(self, *args, **kwargs):
+        # Hash new uploads as they are handed to storage (FileField.pre_save
+        # writes the file during super().save()).
+        if self.file and not self.file._committed and not self.content_hash:
+            self.content_hash = sha256_of(self.file)
+        super().save(*args, **kwargs)
+
 
 class DocumentEmbedding(models.Model):
     document = models.OneToOneField(
         Document, on_delete=models.CASCADE, related_name="embedding"
     )
-    vector = models.BinaryField()  # store serialized embedding (pickle/np array)
+    vector = models.BinaryField()  # normalized vector, see documents/vectors.py
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+
+class DocumentChunk(models.Model):
+    """An overlapping window of a document's text with its own embedding."""
+
+    document = models.ForeignKey(
+        Document, on_delete=models.CASCADE, related_name="chunks"
+    )
+    index = models.PositiveIntegerField()  # position of the window in the text
+    text = models.TextField()
+    vector = models.BinaryField()  # serialized embedding, same format as above
+
+    class Meta:
+        ordering = ["document", "index"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["document", "index"], name="unique_document_chunk"
+            )
+        ]
+
+
+class DocumentTerm(models.Model):
+    """A posting of the keyword (BM25) index: how often a term occurs in a document."""
+
+    document = models.ForeignKey(
+        Document, on_delete=models.CASCADE, related_name="terms"
+    )
+    term = models.CharField(max_length=64)
+    frequency = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["term", "document"], name="unique_document_term"
+            )
+        ]
 
 
 class AccessLog(models.Model):
@@ -53,5 +117,71 @@ class AccessLog(models.Model):
     document = models.ForeignKey(
         Document, on_delete=models.CASCADE, null=True, blank=True  # 👈 important
     )
-    action = models.CharField(max_length=50)  # e.g. upload, view, login, logout
-    timestamp = models.DateTimeField(auto_now_add=True)
+    action = models.CharField(
+        max_length=50, db_index=True
+    )  # e.g. upload, view, login, logout
+    timestamp = models.DateTimeField(
+        default=timezone.now, db_index=True
+    )  # when it happened
+
+
+class AccessLogRollup(models.Model):
+    """Number of AccessLog events per user, document and action in a period."""
+
+    bucket = models.DateTimeField()  # start of the period, UTC
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    # Counts outlive the document, unlike its raw log rows
+    document = models.ForeignKey(
+        Document, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    action = models.CharField(max_length=50)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+        indexes = [models.Index(fields=["bucket", "action"], name="%(class)s_bucket")]
+
+
+class AccessLogHourly(AccessLogRollup):
+    pass
+
+
+class AccessLogDaily(AccessLogRollup):
+    pass
+
+
+class AccessLogRollupState(models.Model):
+    """Singleton: AccessLog rows with id <= last_id are in the rollups."""
+
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class IngestionJob(models.Model):
+    """A queued run of the NLP pipeline for one uploaded document."""
+
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+    document = models.ForeignKey(
+        Document, on_delete=models.CASCADE, related_name="ingestion_jobs"
+    )
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="queued")
+    progress = models.PositiveSmallIntegerField(default=0)  # 0-100
+    stage = models.CharField(max_length=50, blank=True, default="")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    worker = models.CharField(max_length=100, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    heartbeat_at = models.DateTimeField(blank=True, null=True)  # last progress report
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+    def __str__(self):
+        return f"IngestionJob {self.id} ({self.status})"
@@ -0,0 +1,83 @@
+import base64
+import json
+from bisect import bisect_right
+
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def encode_cursor(score, document_id):
+    """Opaque token for the position right after the hit (document_id, score)."""
+    payload = json.dumps([score, document_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        payload = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        score, document_id = json.loads(payload)
+        return float(score), int(document_id)
+    except (ValueError, TypeError):
+        raise ValidationError({"cursor": "Invalid cursor."})
+
+
+class RankedCursorPagination:
+    """
+    Cursor pagination over ranked (document_id, score) hits, which every
+    search path orders by score and then document id. A cursor holds the
+    (score, id) of the last hit served, so the next page starts right after
+    it without re-sorting, and tied scores are never repeated or skipped.
+    """
+
+    cursor_query_param = "cursor"
+
+    def __init__(self, request, page_size=None):
+        self.request = request
+        self.page_size = page_size or settings.SEARCH_PAGE_SIZE
+        # Decoded up front so a bad cursor fails before any search runs.
+        token = request.query_params.get(self.cursor_query_param)
+        self.cursor = decode_cursor(token) if token else None
+
+    def paginate_hits(self, hits):
+        self.hits = hits
+        self.start = 0
+        if self.cursor:
+            score, document_id = self.cursor
+            keys = [(-hit_score, hit_id) for hit_id, hit_score in hits]
+            self.start = bisect_right(keys, (-score, document_id))
+        self.page = hits[self.start : self.start + self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if self.start + len(self.page) >= len(self.hits):
+            return None
+        document_id, score = self.page[-1]
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            encode_cursor(score, document_id),
+        )
+
+    def get_previous_link(self):
+        if self.start == 0:
+            return None
+        url = self.request.build_absolute_uri()
+        previous_start = max(0, self.start - self.page_size)
+        if previous_start == 0:
+            return remove_query_param(url, self.cursor_query_param)
+        document_id, score = self.hits[previous_start - 1]
+        return replace_query_param(
+            url, self.cursor_query_param, encode_cursor(score, document_id)
+        )
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "count": len(self.hits),
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
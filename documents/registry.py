@@ -0,0 +1,110 @@
+import threading
+import time
+
+
+class ModelRegistry:
+    """
+    Loads heavy NLP/LLM models on first use instead of at import time.
+
+    Each model has its own lock, so two threads asking for the same model load
+    it once, while a slow load (e.g. BART) does not block access to models
+    that are already loaded.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.load_times = {}  # name -> seconds spent loading
+
+    def register(self, name, loader):
+        """Register a zero-argument callable that builds the model."""
+        with self._lock:
+            self._loaders[name] = loader
+            self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name):
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        if name not in self._loaders:
+            raise KeyError(f"No model registered under '{name}'")
+        with self._locks[name]:
+            # Another thread may have finished loading while we waited.
+            if name not in self._models:
+                started = time.perf_counter()
+                self._models[name] = self._loaders[name]()
+                self.load_times[name] = time.perf_counter() - started
+                print(f"Loaded model '{name}' in {self.load_times[name]:.2f}s")
+        return self._models[name]
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def names(self):
+        return list(self._loaders)
+
+    def loaded(self):
+        return list(self._models)
+
+
+class LazyModel:
+    """
+    Stand-in for a registered model that resolves it on first attribute access
+    or call, so ``embedder.encode(...)`` and ``classifier(...)`` keep working.
+    """
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        # Don't load the model for introspection (copy, pickle, mock, ...).
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        return getattr(registry.get(self._name), attr)
+
+    def __call__(self, *args, **kwargs):
+        return registry.get(self._name)(*args, **kwargs)
+
+    def __repr__(self):
+        state = "loaded" if registry.is_loaded(self._name) else "not loaded"
+        return f"<LazyModel {self._name} ({state})>"
+
+
+def load_ner():
+    import spacy
+
+    # en_core_web_sm's NER has its own tok2vec, so everything else can go.
+    return spacy.load(
+        "en_core_web_sm",
+        exclude=["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer"],
+    )
+
+
+def load_sentencizer():
+    import spacy
+
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    return nlp
+
+
+def load_embedder():
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer("all-MiniLM-L6-v2")
+
+
+def load_classifier():
+    from transformers import pipeline
+
+    return pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
+
+
+registry = ModelRegistry()
+registry.register("ner", load_ner)
+registry.register("sentencizer", load_sentencizer)
+registry.register("embedder", load_embedder)
+registry.register("classifier", load_classifier)
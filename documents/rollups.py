@@ -0,0 +1,125 @@
+"""
+Hourly and daily AccessLog counts, and retention of the raw rows.
+
+`roll_up()` adds the AccessLog rows written since its last run (tracked by
+id in AccessLogRollupState, so events that arrive late from the buffered
+writer are still counted) to AccessLogHourly and AccessLogDaily. Analytics
+read those small tables instead of scanning the log.
+
+`archive()` moves rolled-up rows older than the retention period into
+gzipped JSON-lines files and deletes them from the table, which keeps the
+raw log, and listing it, bounded.
+"""
+
+import gzip
+import json
+import os
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import AccessLog, AccessLogDaily, AccessLogHourly, AccessLogRollupState
+
+ROLLUPS = {"hour": (AccessLogHourly, TruncHour), "day": (AccessLogDaily, TruncDay)}
+
+
+def _merge(model, groups):
+    """Add grouped counts to the rollup rows of the same key."""
+    groups = list(groups)
+    existing = {}
+    for row in model.objects.filter(bucket__in={g["bucket"] for g in groups}):
+        existing.setdefault((row.bucket, row.user_id, row.document_id, row.action), row)
+    created, updated = [], []
+    for group in groups:
+        key = (group["bucket"], group["user_id"], group["document_id"], group["action"])
+        row = existing.get(key)
+        if row is None:
+            row = existing[key] = model(
+                bucket=group["bucket"],
+                user_id=group["user_id"],
+                document_id=group["document_id"],
+                action=group["action"],
+            )
+            created.append(row)
+        else:
+            updated.append(row)
+        row.count += group["events"]
+    model.objects.bulk_create(created, batch_size=1000)
+    model.objects.bulk_update(updated, ["count"], batch_size=1000)
+
+
+def roll_up(batch_size=50000):
+    """Count AccessLog rows added since the last run. Returns how many."""
+    total = 0
+    while True:
+        with transaction.atomic():
+            state, _ = AccessLogRollupState.objects.select_for_update().get_or_create(
+                pk=1
+            )
+            ids = list(
+                AccessLog.objects.filter(id__gt=state.last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                return total
+            rows = AccessLog.objects.filter(id__gt=state.last_id, id__lte=ids[-1])
+            for model, trunc in ROLLUPS.values():
+                _merge(
+                    model,
+                    rows.annotate(bucket=trunc("timestamp", tzinfo=dt_timezone.utc))
+                    .values("bucket", "user_id", "document_id", "action")
+                    .annotate(events=Count("id")),
+                )
+            state.last_id = ids[-1]
+            state.save()
+        total += len(ids)
+
+
+def archive(before, batch_size=10000):
+    """
+    Move rolled-up AccessLog rows older than ``before`` to a gzipped JSON
+    lines file in ACCESS_LOG_ARCHIVE_DIR. Returns (rows archived, file path
+    or None).
+    """
+    state = AccessLogRollupState.objects.filter(pk=1).first()
+    rows = AccessLog.objects.filter(
+        timestamp__lt=before, id__lte=state.last_id if state else 0
+    ).order_by("id")
+    if not rows.exists():
+        return 0, None
+
+    directory = str(settings.ACCESS_LOG_ARCHIVE_DIR)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(
+        directory,
+        f"access-before-{before:%Y%m%d}-{timezone.now():%Y%m%dT%H%M%S}.jsonl.gz",
+    )
+    archived = []
+    with open(f"{path}.tmp", "wb") as raw, gzip.open(raw, "wt") as f:
+        last_id = 0
+        while True:
+            batch = list(
+                rows.filter(id__gt=last_id).values(
+                    "id", "user_id", "document_id", "action", "timestamp"
+                )[:batch_size]
+            )
+            if not batch:
+                break
+            for row in batch:
+                row["timestamp"] = row["timestamp"].isoformat()
+                f.write(json.dumps(row) + "\n")
+            archived += [row["id"] for row in batch]
+            last_id = batch[-1]["id"]
+        f.close()
+        raw.flush()
+        os.fsync(raw.fileno())  # on disk before the rows are deleted
+    os.replace(f"{path}.tmp", path)
+
+    for start in range(0, len(archived), batch_size):
+        AccessLog.objects.filter(id__in=archived[start : start + batch_size]).delete()
+    return len(archived), path
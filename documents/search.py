@@ -0,0 +1,140 @@
+import numpy as np
+from django.conf import settings
+
+from .ann import get_ann_index
+from .caches import embed_query
+from .index import vector_index
+from .lexical import bm25_search, fuse_rankings
+from .models import Document, DocumentChunk, DocumentEmbedding
+from .vectors import decode_matrix, normalize
+
+
+def best_chunk_scores(query_vec, document_ids):
+    """
+    Cosine similarity of the best-matching chunk of each document, as
+    {document_id: score}. All chunk vectors are scored in one matrix product
+    and rolled up to their document with a max.
+    """
+    rows = list(
+        DocumentChunk.objects.filter(document_id__in=document_ids).values_list(
+            "document_id", "vector"
+        )
+    )
+    if not rows:
+        return {}
+
+    owners = np.array([document_id for document_id, _ in rows])
+    # Stored vectors are pre-normalized, so cosine is a dot product.
+    matrix = decode_matrix(vector for _, vector in rows)
+    scores = matrix @ normalize(query_vec)
+
+    ids, positions = np.unique(owners, return_inverse=True)
+    best = np.full(len(ids), -np.inf)
+    np.maximum.at(best, positions, scores)
+    return dict(zip(ids.tolist(), best.tolist()))
+
+
+def roll_up_chunk_scores(query_vec, hits):
+    """
+    Re-score (document_id, score) pairs at chunk granularity: a document scores
+    the best of its summary embedding and its chunks. Returned best first.
+    """
+    chunk_scores = best_chunk_scores(query_vec, [doc_id for doc_id, _ in hits])
+    hits = [
+        (doc_id, max(score, chunk_scores.get(doc_id, -np.inf)))
+        for doc_id, score in hits
+    ]
+    return sorted(hits, key=lambda hit: (-hit[1], hit[0]))
+
+
+def ann_search(ann, query_vec, categories, k, n_probe):
+    """
+    Approximate top ``k`` from the persisted IVF index, corrected for what
+    changed since it was built: embeddings written later are scored exactly,
+    and deleted or re-categorized documents are dropped.
+    """
+    ids, scores = ann.search(
+        query_vec, k * settings.ANN_OVERSAMPLE, n_probe, categories
+    )
+    hits = dict(zip(ids.tolist(), scores.tolist()))
+
+    fresh = DocumentEmbedding.objects.filter(updated_at__gte=ann.built_at)
+    if categories is not None:
+        fresh = fresh.filter(document__category__in=categories)
+    rows = list(fresh.values_list("document_id", "vector"))
+    if rows:
+        fresh_scores = decode_matrix(vector for _, vector in rows) @ normalize(
+            query_vec
+        )
+        hits.update(zip([doc_id for doc_id, _ in rows], fresh_scores.tolist()))
+
+    current = Document.objects.filter(id__in=list(hits))
+    if categories is not None:
+        current = current.filter(category__in=categories)
+    current = set(current.values_list("id", flat=True))
+    hits = [(doc_id, score) for doc_id, score in hits.items() if doc_id in current]
+    return sorted(hits, key=lambda hit: (-hit[1], hit[0]))[:k]
+
+
+def semantic_search(
+    query_vec, categories=None, k=5, granularity="document", n_probe=None
+):
+    """
+    Top ``k`` (document_id, score) pairs for a query vector among documents in
+    ``categories`` (None for all). Uses the IVF index once the corpus reaches
+    ANN_MIN_VECTORS and the exact in-memory vector index otherwise, or when
+    the probed lists hold fewer than ``k`` matches.
+
+    At chunk granularity only the CHUNK_SEARCH_CANDIDATES best documents by
+    their own embedding are re-scored by their chunks, so a query reads a
+    bounded number of chunk rows however large the corpus is.
+    """
+    if granularity == "chunk":
+        shortlist = max(k, settings.CHUNK_SEARCH_CANDIDATES)
+        hits = vector_index.search(query_vec, categories, k=shortlist)
+        return roll_up_chunk_scores(query_vec, hits)[:k]
+
+    ann = get_ann_index()
+    if ann is not None and len(ann) >= settings.ANN_MIN_VECTORS:
+        hits = ann_search(
+            ann, query_vec, categories, k, n_probe or settings.ANN_N_PROBE
+        )
+        if len(hits) >= k:
+            return hits
+    return vector_index.search(query_vec, categories, k=k)
+
+
+SEARCH_MODES = ["semantic", "keyword", "hybrid"]
+
+
+def search_documents(
+    query, categories=None, k=5, mode="semantic", granularity="document", n_probe=None
+):
+    """
+    Top ``k`` (document_id, score) hits for query text. ``mode`` is one of
+    SEARCH_MODES: embedding similarity, BM25 keyword match, or both fused by
+    reciprocal rank (scores are then RRF scores, not cosines).
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode '{mode}'")
+    if mode == "keyword":
+        return bm25_search(query, categories, k)
+
+    query_vec = embed_query(query)
+    if mode == "semantic":
+        return semantic_search(query_vec, categories, k, granularity, n_probe)
+
+    depth = max(k, settings.HYBRID_CANDIDATES)
+    return fuse_rankings(
+        [
+            semantic_search(query_vec, categories, depth, granularity, n_probe),
+            bm25_search(query, categories, depth),
+        ],
+        k,
+    )
+
+
+def documents_for(hits):
+    """Documents for (document_id, score) pairs, in the same order."""
+    documents = Document.objects.in_bulk([doc_id for doc_id, _ in hits])
+    return [documents[doc_id] for doc_id, _ in hits if doc_id in documents]
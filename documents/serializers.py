@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Document, DocumentEmbedding, AccessLog
+from .models import Document, DocumentEmbedding, AccessLog, IngestionJob
 from users.serializers import UserSerializer
 
 
@@ -21,3 +21,31 @@ class AccessLogSerializer(serializers.ModelSerializer):
     class Meta:
         model = AccessLog
         fields = "__all__"
+
+
+class IngestionJobSerializer(serializers.ModelSerializer):
+    # The traceback in IngestionJob.error stays on the server (admin, worker
+    # logs); uploaders only learn that processing failed.
+    error = serializers.SerializerMethodField()
+
+    class Meta:
+        model = IngestionJob
+        fields = [
+            "id",
+            "document",
+            "status",
+            "progress",
+            "stage",
+            "attempts",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+
+    def get_error(self, job):
+        if not job.error:
+            return ""
+        if job.status == "failed":
+            return "Processing failed."
+        return "Processing failed; it will be retried."
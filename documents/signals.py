@@ -1,23 +1,27 @@
 import os
 import re
-import pickle
 import docx
 import PyPDF2
-import spacy
 import numpy as np
-from collections import Counter
-from django.db.models.signals import post_save
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from sentence_transformers import SentenceTransformer
-from .models import Document, DocumentEmbedding
-from transformers import pipeline
-import pandas as pd
+from django.utils import timezone
+from .models import Document, DocumentChunk, DocumentEmbedding, IngestionJob
+from .caches import bump_search_generation
+from .dedup import find_duplicate, reuse_processed_document
+from .index import vector_index
+from .lexical import index_terms
+from .registry import LazyModel
+from .vectors import encode_vector
 
-# Load NLP models only once
-nlp = spacy.load("en_core_web_sm")
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
+# NLP models are loaded once, on first use (see documents/registry.py)
+ner = LazyModel("ner")  # en_core_web_sm with only the NER component
+sentencizer = LazyModel("sentencizer")  # rule-based sentence splitting only
+embedder = LazyModel("embedder")
 
-classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
+classifier = LazyModel("classifier")
 CATEGORIES = [
     "Finance - budgets, invoices, balance sheets, tax documents, audit reports, payroll, expense reports",
     "HR - employee records, resumes, leave policies, training manuals, performance reviews, recruitment documents, policy handbooks",
@@ -45,6 +49,8 @@ def extract_text(file_path, file_type):
             with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
                 text = f.read()
         elif file_type == "csv":
+            import pandas as pd
+
             df = pd.read_csv(file_path, encoding="utf-8", errors="ignore")
             text = " ".join(df.astype(str).apply(lambda row: " ".join(row), axis=1))
         else:
@@ -65,86 +71,268 @@ def extract_metadata(text):
     date_match = re.search(r"\b\d{4}-\d{2}-\d{2}\b", text)
     date = date_match.group(0) if date_match else None
 
-    doc = nlp(text[:2000])
+    doc = ner(text[:2000])
     entities = [{"text": ent.text, "label": ent.label_} for ent in doc.ents]
 
     return title, author, date, entities
 
 
+# Long texts are fed to spaCy in pieces well under its max_length (1,000,000).
+SPACY_CHUNK_CHARS = 100_000
+WORD_RE = re.compile(r"\w+")
+
+
+def iter_text_chunks(text, size=None):
+    """Yield (offset, chunk) pieces of at most ``size`` chars, cut at line/word breaks."""
+    size = size or SPACY_CHUNK_CHARS
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            cut = text.rfind("\n", start, end)
+            if cut <= start:
+                cut = text.rfind(" ", start, end)
+            if cut > start:
+                end = cut + 1
+        yield start, text[start:end]
+        start = end
+
+
+def split_sentences(text):
+    """Sentence texts and their start offsets in ``text``."""
+    chunks = ((chunk, offset) for offset, chunk in iter_text_chunks(text))
+    sentences, starts = [], []
+    for doc, offset in sentencizer.pipe(chunks, as_tuples=True):
+        for sent in doc.sents:
+            sentence = sent.text.strip()
+            if sentence:
+                leading = len(sent.text) - len(sent.text.lstrip())
+                sentences.append(sentence)
+                starts.append(offset + sent.start_char + leading)
+    return sentences, starts
+
+
 def summarize_text(text, n=3):
-    doc = nlp(text)
-    sentences = [sent.text for sent in doc.sents]
+    sentences, starts = split_sentences(text)
     if not sentences:
         return ""
 
-    words = re.findall(r"\w+", text.lower())
-    freq = Counter(words)
-    scores = {}
-    for sent in sentences:
-        sent_words = re.findall(r"\w+", sent.lower())
-        scores[sent] = sum(freq[w] for w in sent_words)
+    # Term frequencies over the whole text, then each word's weight is added to
+    # the sentence its offset falls in: one regex pass, no per-sentence loop.
+    matches = list(WORD_RE.finditer(text))
+    scores = np.zeros(len(sentences))
+    if matches:
+        words = np.array([m.group().lower() for m in matches])
+        _, word_ids = np.unique(words, return_inverse=True)
+        weights = np.bincount(word_ids)[word_ids]
+        word_starts = np.fromiter((m.start() for m in matches), dtype=np.int64)
+        owner = np.searchsorted(starts, word_starts, side="right") - 1
+        inside = owner >= 0
+        scores = np.bincount(
+            owner[inside], weights=weights[inside], minlength=len(sentences)
+        )
 
-    summary = " ".join(
-        [s for s, _ in sorted(scores.items(), key=lambda x: x[1], reverse=True)[:n]]
-    )
-    return summary
+    # Highest scores first, ties in document order; repeated sentences once.
+    summary = []
+    for i in np.argsort(-scores, kind="stable"):
+        if sentences[i] not in summary:
+            summary.append(sentences[i])
+        if len(summary) == n:
+            break
+    return " ".join(summary)
+
+
+def serialize_embedding(vec):
+    return encode_vector(vec)
 
 
 def create_embedding(text):
     vec = embedder.encode(text)
-    return pickle.dumps(vec)
+    return serialize_embedding(vec)
+
+
+def chunk_text(text, size=None, overlap=None):
+    """Split text into overlapping windows of ``size`` words."""
+    size = size or settings.CHUNK_SIZE_WORDS
+    overlap = settings.CHUNK_OVERLAP_WORDS if overlap is None else overlap
+    words = text.split()
+    step = max(1, size - overlap)
+    return [
+        " ".join(words[start : start + size])
+        for start in range(0, max(1, len(words) - overlap), step)
+        if words[start : start + size]
+    ]
+
+
+def create_chunks(items, batch_size=None):
+    """
+    Chunk and embed the text of several documents with batched
+    embedder.encode calls. ``items`` is a list of (document, text) pairs;
+    existing chunks of those documents are replaced.
+    """
+    batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+    chunks = []
+    for document, text in items:
+        for index, chunk in enumerate(chunk_text(text)):
+            chunks.append(DocumentChunk(document=document, index=index, text=chunk))
+    if not chunks:
+        return []
+
+    vectors = embedder.encode([chunk.text for chunk in chunks], batch_size=batch_size)
+    for chunk, vector in zip(chunks, vectors):
+        chunk.vector = serialize_embedding(vector)
+
+    DocumentChunk.objects.filter(document__in=[doc for doc, _ in items]).delete()
+    return DocumentChunk.objects.bulk_create(chunks)
+
+
+def embedding_text(title, summary, text):
+    """Text that represents a document in DocumentEmbedding."""
+    if title or summary:
+        return (title or "") + " " + (summary or "")
+    return text[:1000]
+
+
+def category_from_label(label):
+    """Turn a CATEGORIES label into a Document.category value."""
+    return label.split(" - ")[0] if label else "Unknown"
+
+
+def detect_file_type(file_path):
+    """Map a file extension onto one of Document.FILE_TYPE_CHOICES."""
+    ext = os.path.splitext(file_path)[-1].lower()
+    file_type = ext.replace(".", "")
+    if file_type not in ["pdf", "docx", "doc", "txt", "csv"]:
+        file_type = "other"
+    return file_type
+
+
+def ingest_document(instance, progress=None):
+    """
+    Run the full NLP pipeline for a document: extract text, metadata, summary,
+    category and embedding. ``progress(percent, stage)`` is called between the
+    slow steps so callers (the ingestion worker) can report status.
+    """
+
+    def report(percent, stage):
+        if progress is not None:
+            progress(percent, stage)
+
+    # Identical content was already processed: reuse its results.
+    duplicate = find_duplicate(instance.content_hash, exclude_id=instance.id)
+    if duplicate is not None:
+        report(50, "deduplicated")
+        reuse_processed_document(duplicate, instance)
+        bump_search_generation()  # the copied chunks and postings are in
+        return
+
+    file_path = instance.file.path
+    # --- EDIT: Determine file type based on extension ---
+    file_type = detect_file_type(file_path)
+
+    # Save the detected type to the model
+    instance.file_type = file_type
+    instance.save(update_fields=["file_type"])
+
+    # --- EDIT: Skip processing if type is "other" ---
+    if file_type == "other":
+        return
+
+    # Extract text
+    report(10, "extracting")
+    text = extract_text(file_path, file_type)
+    if not text:
+        return
+
+    report(30, "metadata")
+    title, author, date, entities = extract_metadata(text)
+    report(45, "summarizing")
+    summary = summarize_text(text)
+
+    # Embed first: the fast classifier scores this vector against category
+    # prototypes and only falls back to zero-shot BART when it is ambiguous.
+    report(60, "embedding")
+    vector = embedder.encode(embedding_text(title, summary, text))
+
+    # Classification
+    report(75, "classifying")
+    from .classification import classify_document
+
+    instance.category = classify_document(text, vector)
+
+    # Update metadata
+    instance.title = title or instance.title
+    instance.author = author or instance.author
+    instance.summary = summary
+    if date:
+        instance.date = date
+    instance.entities = entities
+    instance.save()
+
+    # Save embedding
+    DocumentEmbedding.objects.update_or_create(
+        document=instance, defaults={"vector": serialize_embedding(vector)}
+    )
+
+    # Keyword (BM25) postings over title, summary and full text
+    index_terms([(instance, [instance.title, summary, text])])
+
+    # Chunk-level vectors so search and chat can reach deeper passages
+    report(90, "chunking")
+    create_chunks([(instance, text)])
+
+    # The embedding's save already invalidated cached searches, but keyword,
+    # hybrid and chunk searches run since then ranked without the postings
+    # and chunks written after it.
+    bump_search_generation()
+
+
+@receiver(pre_save, sender=Document)
+def note_category_change(sender, instance, update_fields=None, **kwargs):
+    """Record on the instance whether this save changes its category."""
+    instance._category_changed = False
+    if instance.pk is None:
+        return
+    if update_fields is not None and "category" not in update_fields:
+        return
+    previous = (
+        Document.objects.filter(pk=instance.pk)
+        .values_list("category", flat=True)
+        .first()
+    )
+    instance._category_changed = previous != instance.category
 
 
 @receiver(post_save, sender=Document)
 def process_document(sender, instance, created, **kwargs):
+    """Queue new uploads for the ingestion worker instead of processing inline."""
     if created:
-        file_path = instance.file.path
-        # --- EDIT: Determine file type based on extension ---
-        ext = os.path.splitext(file_path)[-1].lower()
-        file_type = ext.replace(".", "")
-        if file_type not in ["pdf", "docx", "doc", "txt", "csv"]:
-            file_type = "other"
-
-        # Save the detected type to the model
-        instance.file_type = file_type
-        instance.save(update_fields=["file_type"])
-
-        # --- EDIT: Skip processing if type is "other" ---
-        if file_type == "other":
-            return
-
-        # Extract text
-        text = extract_text(file_path, file_type)
-        if not text:
-            return
-
-        title, author, date, entities = extract_metadata(text)
-        summary = summarize_text(text)
-
-        # Classification
-        classification = classifier(text, candidate_labels=CATEGORIES)
-        predicted_category = classification["labels"][0]
-        instance.category = (
-            predicted_category.split(" - ")[0] if predicted_category else "Unknown"
-        )
-        print(
-            predicted_category.split(" - ")[0],
-            predicted_category.split(" - ")[0] if predicted_category else "Unknown",
-        )
+        IngestionJob.objects.create(document=instance)
+        return
 
-        # Update metadata
-        instance.title = title or instance.title
-        instance.author = author or instance.author
-        instance.summary = summary
-        if date:
-            instance.date = date
-        instance.entities = entities
-        instance.save()
-
-        # Save embedding
-        emb = create_embedding(
-            (title or "") + " " + (summary or "") if (title or summary) else text[:1000]
-        )
-        DocumentEmbedding.objects.update_or_create(
-            document=instance, defaults={"vector": emb}
+    if instance._category_changed:
+        # The vector index partitions by category; bump updated_at so other
+        # processes re-read this row on their next sync.
+        DocumentEmbedding.objects.filter(document=instance).update(
+            updated_at=timezone.now()
         )
+        vector_index.set_category(instance.id, instance.category)
+
+
+@receiver(post_save, sender=DocumentEmbedding)
+def index_embedding(sender, instance, **kwargs):
+    vector_index.upsert(instance)
+
+
+@receiver(post_delete, sender=DocumentEmbedding)
+def unindex_embedding(sender, instance, **kwargs):
+    vector_index.remove(instance.document_id)
+
+
+@receiver([post_save, post_delete], sender=Document)
+@receiver([post_save, post_delete], sender=DocumentEmbedding)
+def invalidate_search_results(sender, **kwargs):
+    bump_search_generation()
+    # Again once the write is visible to other processes: a search there may
+    # have cached a ranking without it in between.
+    transaction.on_commit(bump_search_generation)
@@ -0,0 +1,231 @@
+"""
+Append-only, memory-mapped file of document embeddings, shared by every
+process on the host through the OS page cache.
+
+Layout: a 16-byte header (magic ``b"DVEM"``, version, dimension) followed by
+fixed-width records of ``dim + 4`` little-endian float32 slots. Slots 0-1
+hold the int64 document id, slots 2-3 the float64 ``updated_at`` timestamp
+of the DocumentEmbedding row and the rest the normalized vector.
+
+Writers only ever append whole records under a file lock, so readers map the
+file read-only and pick up new rows by remapping when it grows. A later
+record for a document supersedes earlier ones and a negative id is a
+tombstone, which makes updates and deletes appends too.
+`manage.py compact_embeddings` rewrites the file without the dead rows.
+"""
+
+import os
+import struct
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+
+from .vectors import normalize
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development only
+    fcntl = None
+
+MAGIC = b"DVEM"
+VERSION = 1
+HEADER = struct.Struct("<4sII4x")
+META_SLOTS = 4
+
+_memory_db_dir = None
+
+
+def default_store_path():
+    """
+    EMBEDDING_STORE_DIR/<database name>.embeddings, so each database gets its
+    own file; in-memory databases (the test suite) use a per-process temp dir.
+    """
+    global _memory_db_dir
+    if connection.vendor == "sqlite" and connection.is_in_memory_db():
+        if _memory_db_dir is None:
+            _memory_db_dir = tempfile.mkdtemp(prefix="documind-embeddings-")
+        return os.path.join(_memory_db_dir, "memory.embeddings")
+    name = os.path.basename(str(connection.settings_dict["NAME"]))
+    return os.path.join(str(settings.EMBEDDING_STORE_DIR), f"{name}.embeddings")
+
+
+def _records(items, dim):
+    """Pack (document_id, updated_at, vector or None) tuples into rows."""
+    items = list(items)
+    block = np.zeros((len(items), dim + META_SLOTS), dtype="<f4")
+    for row, (document_id, updated_at, vector) in zip(block, items):
+        deleted = vector is None
+        row[0:2] = np.array([-document_id if deleted else document_id], "<i8").view(
+            "<f4"
+        )
+        row[2:4] = np.array([updated_at.timestamp()], "<f8").view("<f4")
+        if not deleted:
+            row[META_SLOTS:] = normalize(vector)
+    return block.tobytes()
+
+
+def _write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view) :]
+
+
+class EmbeddingStore:
+    def __init__(self, path=None):
+        self._path = path
+        self._open_path = None
+        self._inode = None
+        self._read = 0
+        self.dim = None
+        self.matrix = None
+        self.live = {}  # document id -> (row, updated_at timestamp)
+
+    @property
+    def path(self):
+        return str(self._path) if self._path else default_store_path()
+
+    @contextmanager
+    def _write_lock(self):
+        path = self.path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(f"{path}.lock", "a") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield path
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def append(self, items):
+        """
+        Append (document_id, updated_at, vector) records; a vector of None
+        marks the document deleted.
+        """
+        items = list(items)
+        if not items:
+            return
+        with self._write_lock() as path:
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                vectors = [vector for _, _, vector in items if vector is not None]
+                if os.fstat(fd).st_size == 0:
+                    if not vectors:
+                        return  # nothing stored yet, so nothing to delete
+                    dim = np.size(vectors[0])
+                    _write_all(fd, HEADER.pack(MAGIC, VERSION, dim))
+                else:
+                    dim = self._read_dim(path)
+                if vectors and np.size(vectors[0]) != dim:
+                    # A different embedding model: the old vectors cannot be
+                    # compared with new ones, so start over. Readers copy the
+                    # remaining embeddings back in from the database.
+                    print(
+                        f"Embedding dimension changed ({dim} -> "
+                        f"{np.size(vectors[0])}); recreating {path}"
+                    )
+                    dim = np.size(vectors[0])
+                    self._replace(path, dim, [_records(items, dim)])
+                    return
+                _write_all(fd, _records(items, dim))
+            finally:
+                os.close(fd)
+
+    def _read_dim(self, path):
+        with open(path, "rb") as f:
+            magic, version, dim = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not an embedding store")
+        return dim
+
+    def refresh(self):
+        """
+        Map records appended since the last call. Returns ``(reset, touched)``:
+        ``reset`` is True when row numbers changed (first call, compaction,
+        file removed) and ``touched`` holds the document ids of new records.
+        """
+        path = self.path
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            reset = self._open_path is not None
+            self.__init__(self._path)
+            return reset, set()
+
+        reset = path != self._open_path or stat.st_ino != self._inode
+        if reset:
+            self._open_path, self._inode = path, stat.st_ino
+            self._read, self.live = 0, {}
+            self.dim = self._read_dim(path)
+        width = self.dim + META_SLOTS
+        rows = (stat.st_size - HEADER.size) // (width * 4)
+        if rows == self._read and not reset:
+            return False, set()
+
+        if rows:
+            records = np.memmap(
+                path, dtype="<f4", mode="r", offset=HEADER.size, shape=(rows, width)
+            )
+        else:
+            records = np.empty((0, width), dtype="<f4")
+        # A strided view, not a copy: BLAS reads the vectors straight from the
+        # shared pages.
+        self.matrix = records[:, META_SLOTS:]
+
+        new = np.ascontiguousarray(records[self._read : rows, :META_SLOTS])
+        ids = new[:, 0:2].copy().view("<i8").ravel().tolist()
+        stamps = new[:, 2:4].copy().view("<f8").ravel().tolist()
+        touched = set()
+        for row, document_id, stamp in zip(range(self._read, rows), ids, stamps):
+            if document_id < 0:
+                self.live.pop(-document_id, None)
+                touched.add(-document_id)
+            else:
+                self.live[document_id] = (row, stamp)
+                touched.add(document_id)
+        self._read = rows
+        return reset, touched
+
+    def _replace(self, path, dim, chunks):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, dim))
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp_path, path)  # readers remap on the new inode
+
+    def compact(self, keep):
+        """
+        Rewrite the file with only the current record of each document id in
+        ``keep``. Returns the row counts before and after.
+        """
+        with self._write_lock() as path:
+            current = EmbeddingStore(path)
+            current.refresh()
+            if current.matrix is None:
+                return 0, 0
+            rows = sorted(row for doc, (row, _) in current.live.items() if doc in keep)
+            records = np.memmap(
+                path,
+                dtype="<f4",
+                mode="r",
+                offset=HEADER.size,
+                shape=(current._read, current.dim + META_SLOTS),
+            )
+            self._replace(
+                path,
+                current.dim,
+                (
+                    records[rows[i : i + 4096]].tobytes()
+                    for i in range(0, len(rows), 4096)
+                ),
+            )
+            return current._read, len(rows)
+
+    def rebuild(self, items, dim):
+        """Replace the file with records for ``items`` only."""
+        with self._write_lock() as path:
+            self._replace(path, dim, [_records(items, dim)])
@@ -1,3 +1,947 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import importlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from users.models import User
+from .ann import IVFIndex, build_from_database
+from .audit import (
+    AccessLogBuffer,
+    _journal_dir,
+    access_log_buffer,
+    log_access,
+    replay_journals,
+)
+from .caches import LRUCache, cached_search, embed_query, query_embeddings
+from .classification import classify_document, reset_prototypes
+from .dedup import dedup_stats
+from .pagination import decode_cursor, encode_cursor
+from .lexical import bm25_search, fuse_rankings, index_terms, tokenize
+from .jobs import claim_next_job, requeue_stale_jobs, run_job
+from .index import VectorIndex, vector_index
+from .models import (
+    AccessLog,
+    AccessLogDaily,
+    AccessLogHourly,
+    Document,
+    DocumentChunk,
+    DocumentEmbedding,
+    IngestionJob,
+)
+from .registry import ModelRegistry
+from .rollups import archive, roll_up
+from .store import EmbeddingStore
+from .search import roll_up_chunk_scores, search_documents, semantic_search
+from .vectors import decode_matrix, decode_vector, encode_vector
+from .signals import (
+    CATEGORIES,
+    chunk_text,
+    ingest_document,
+    iter_text_chunks,
+    summarize_text,
+)
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class IngestionQueueTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user("alice", password="pw", role="HR")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, name="notes.txt", content=b"Quarterly report"):
+        return self.client.post(
+            "/api/documents/",
+            {"file": SimpleUploadedFile(name, content)},
+            format="multipart",
+        )
+
+    @mock.patch("documents.signals.ingest_document")
+    def test_upload_queues_job_without_processing(self, ingest):
+        response = self.upload()
+
+        self.assertEqual(response.status_code, 201)
+        ingest.assert_not_called()
+        job = IngestionJob.objects.get(document_id=response.data["id"])
+        self.assertEqual(job.status, "queued")
+
+        status = self.client.get(f"/api/documents/{response.data['id']}/status/")
+        self.assertEqual(status.data["status"], "queued")
+
+    @mock.patch("documents.signals.ingest_document")
+    def test_worker_runs_queued_jobs(self, ingest):
+        doc_id = self.upload().data["id"]
+
+        call_command("ingestion_worker", "--once", stdout=mock.MagicMock())
+
+        ingest.assert_called_once()
+        job = IngestionJob.objects.get(document_id=doc_id)
+        self.assertEqual((job.status, job.progress), ("done", 100))
+
+    def test_job_is_claimed_once(self):
+        self.upload()
+        self.assertIsNotNone(claim_next_job("w1"))
+        self.assertIsNone(claim_next_job("w2"))
+
+    @override_settings(INGESTION_MAX_ATTEMPTS=2)
+    @mock.patch("documents.signals.ingest_document", side_effect=RuntimeError("boom"))
+    def test_failed_job_is_retried_then_marked_failed(self, ingest):
+        self.upload()
+
+        run_job(claim_next_job())
+        job = IngestionJob.objects.get()
+        self.assertEqual(job.status, "queued")
+
+        run_job(claim_next_job())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("failed", 2))
+        self.assertIn("boom", job.error)
+        # The traceback is not shown to the uploader.
+        status = self.client.get(f"/api/documents/{job.document_id}/status/")
+        self.assertEqual(status.data["error"], "Processing failed.")
+
+    @mock.patch("documents.classification.classify_document", return_value="HR")
+    @mock.patch("documents.signals.extract_metadata", return_value=("T", 0, 0, []))
+    @mock.patch("documents.signals.summarize_text", return_value="Leave policy")
+    @mock.patch("documents.signals.embedder")
+    @mock.patch("documents.signals.index_terms")
+    @mock.patch("documents.signals.create_chunks")
+    @mock.patch("documents.signals.bump_search_generation")
+    def test_ingest_invalidates_searches_after_its_last_write(
+        self, bump, create_chunks, index_terms, embedder, *mocks
+    ):
+        embedder.encode.return_value = np.ones(4)
+        writes = mock.Mock()
+        writes.attach_mock(index_terms, "index_terms")
+        writes.attach_mock(create_chunks, "create_chunks")
+        writes.attach_mock(bump, "bump")
+        doc = Document.objects.create(
+            uploader=self.user, file=SimpleUploadedFile("leave.txt", b"Leave policy")
+        )
+
+        ingest_document(doc)
+
+        names = [name for name, _, _ in writes.mock_calls]
+        self.assertEqual(names[-3:], ["index_terms", "create_chunks", "bump"])
+
+    @override_settings(INGESTION_MAX_ATTEMPTS=2)
+    def test_stale_job_is_failed_after_max_attempts(self):
+        self.upload("a.txt", b"first")
+        self.upload("b.txt", b"second")
+        crashed, retry = IngestionJob.objects.order_by("id")
+        IngestionJob.objects.update(
+            status="running", started_at=timezone.now() - timedelta(hours=1)
+        )
+        IngestionJob.objects.filter(id=crashed.id).update(attempts=2)
+        IngestionJob.objects.filter(id=retry.id).update(attempts=1)
+
+        self.assertEqual(requeue_stale_jobs(stale_after=60), 1)
+
+        crashed.refresh_from_db()
+        retry.refresh_from_db()
+        self.assertEqual(crashed.status, "failed")
+        self.assertIsNotNone(crashed.finished_at)
+        self.assertEqual(retry.status, "queued")
+
+    def test_job_still_reporting_progress_is_not_requeued(self):
+        self.upload()
+        job = claim_next_job("w1")
+        IngestionJob.objects.filter(id=job.id).update(
+            started_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(requeue_stale_jobs(stale_after=60), 0)
+
+        IngestionJob.objects.filter(id=job.id).update(
+            heartbeat_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(requeue_stale_jobs(stale_after=60), 1)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class DeduplicationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("bob", password="pw", role="Finance")
+
+    def create(self, content):
+        return Document.objects.create(
+            uploader=self.user, file=SimpleUploadedFile("invoice.txt", content)
+        )
+
+    def test_upload_is_hashed(self):
+        doc = self.create(b"Invoice 42")
+        self.assertEqual(doc.content_hash, hashlib.sha256(b"Invoice 42").hexdigest())
+
+    @mock.patch("documents.signals.extract_text")
+    def test_identical_upload_reuses_processed_results(self, extract_text):
+        original = self.create(b"Invoice 42")
+        Document.objects.filter(id=original.id).update(
+            summary="Invoice summary", category="Finance", entities=[]
+        )
+        DocumentEmbedding.objects.create(
+            document=original, vector=encode_vector(np.ones(4))
+        )
+
+        copy = self.create(b"Invoice 42")
+        ingest_document(copy)
+
+        extract_text.assert_not_called()
+        copy.refresh_from_db()
+        self.assertEqual(copy.duplicate_of, original)
+        self.assertEqual((copy.summary, copy.category), ("Invoice summary", "Finance"))
+        self.assertEqual(bytes(copy.embedding.vector), bytes(original.embedding.vector))
+        self.assertEqual(dedup_stats()["duplicate_hits"], 1)
+
+
+class ModelRegistryTests(SimpleTestCase):
+    def test_model_is_loaded_once_on_first_use(self):
+        registry = ModelRegistry()
+        loader = mock.Mock(side_effect=lambda: time.sleep(0.05) or object())
+        registry.register("slow", loader)
+        self.assertFalse(registry.is_loaded("slow"))
+
+        threads = [
+            threading.Thread(target=registry.get, args=("slow",)) for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        loader.assert_called_once()
+        self.assertIn("slow", registry.load_times)
+
+    def test_importing_the_pipeline_loads_no_models(self):
+        from .registry import registry
+
+        self.assertNotIn("classifier", registry.loaded())
+
+
+@override_settings(CLASSIFIER_MODE="embedding", CLASSIFIER_MARGIN=0.1)
+class EmbeddingClassifierTests(SimpleTestCase):
+    def setUp(self):
+        # One axis per non-Unknown category: Finance, HR, Legal, Tech.
+        embedder = mock.patch("documents.classification.embedder")
+        embedder.start().encode.side_effect = lambda labels: np.eye(len(labels), 8)
+        self.addCleanup(embedder.stop)
+        reset_prototypes()
+        self.addCleanup(reset_prototypes)
+
+    @mock.patch("documents.classification.classifier")
+    def test_confident_embedding_skips_zero_shot(self, classifier):
+        vector = np.array([0.1, 0.9, 0, 0, 0, 0, 0, 0])
+        self.assertEqual(classify_document("Leave policy", vector), "HR")
+        classifier.assert_not_called()
+
+    @mock.patch("documents.classification.classifier")
+    def test_ambiguous_embedding_falls_back_to_zero_shot(self, classifier):
+        classifier.return_value = {"labels": [CATEGORIES[2]], "scores": [0.9]}
+        vector = np.array([0.5, 0.52, 0, 0, 0, 0, 0, 0])
+        self.assertEqual(classify_document("NDA", vector), "Legal")
+        classifier.assert_called_once()
+
+    @mock.patch("documents.classification.classifier")
+    def test_weak_match_falls_back_and_can_stay_unknown(self, classifier):
+        classifier.return_value = {"labels": ["Unknown"], "scores": [0.6]}
+        # Clearly closest to HR, but barely related to any category.
+        vector = np.array([0, 0.15, 0, 0, 0.99, 0, 0, 0])
+        self.assertEqual(classify_document("Lunch menu", vector), "Unknown")
+        classifier.assert_called_once()
+
+
+class SummarizeTextTests(SimpleTestCase):
+    TEXT = (
+        "Invoice total is due. The weather was nice.\n"
+        "Invoice payment and invoice total are due. Goodbye."
+    )
+
+    def test_picks_highest_term_frequency_sentences(self):
+        self.assertEqual(
+            summarize_text(self.TEXT, n=2),
+            "Invoice payment and invoice total are due. Invoice total is due.",
+        )
+
+    def test_long_text_is_processed_in_chunks(self):
+        with mock.patch("documents.signals.SPACY_CHUNK_CHARS", 50):
+            chunks = list(iter_text_chunks(self.TEXT))
+            self.assertGreater(len(chunks), 1)
+            self.assertEqual("".join(chunk for _, chunk in chunks), self.TEXT)
+            self.assertEqual(
+                summarize_text(self.TEXT, n=1),
+                "Invoice payment and invoice total are due.",
+            )
+
+
+class ChunkTests(TestCase):
+    def test_chunks_overlap_and_cover_the_text(self):
+        text = " ".join(str(i) for i in range(25))
+        chunks = chunk_text(text, size=10, overlap=3)
+        self.assertEqual(chunks[0].split(), [str(i) for i in range(10)])
+        self.assertEqual(chunks[1].split()[0], "7")
+        self.assertEqual(chunks[-1].split()[-1], "24")
+
+    def test_document_scores_its_best_chunk(self):
+        user = User.objects.create_user("carol", password="pw", role="Tech")
+        doc = Document.objects.create(uploader=user, file="spec.txt")
+        for index, vector in enumerate([[1.0, 0.0], [0.6, 0.8]]):
+            DocumentChunk.objects.create(
+                document=doc,
+                index=index,
+                text=f"chunk {index}",
+                vector=encode_vector(vector),
+            )
+
+        hits = roll_up_chunk_scores(np.array([0.0, 1.0]), [(doc.id, 0.1)])
+        self.assertAlmostEqual(hits[0][1], 0.8, places=5)
+
+    @override_settings(CHUNK_SEARCH_CANDIDATES=20)
+    def test_chunk_search_rescores_a_shortlist(self):
+        with mock.patch("documents.search.vector_index") as index, mock.patch(
+            "documents.search.roll_up_chunk_scores", return_value=[]
+        ) as roll_up:
+            semantic_search(np.ones(2), ["Tech"], k=5, granularity="chunk")
+            semantic_search(np.ones(2), ["Tech"], k=50, granularity="chunk")
+        self.assertEqual(
+            [call.kwargs["k"] for call in index.search.call_args_list], [20, 50]
+        )
+        self.assertEqual(roll_up.call_count, 2)
+
+
+class VectorFormatTests(SimpleTestCase):
+    def test_round_trip_is_normalized_and_zero_copy(self):
+        blob = encode_vector([3.0, 4.0], "float32")
+        vector = decode_vector(blob)
+        np.testing.assert_allclose(vector, [0.6, 0.8])
+        self.assertFalse(vector.flags.owndata)
+
+    def test_float16_matrix_decodes_to_float32(self):
+        matrix = decode_matrix([encode_vector([1, 0], "float16")] * 2)
+        self.assertEqual((matrix.shape, matrix.dtype), ((2, 2), np.float32))
+
+    def test_rejects_pickled_vectors(self):
+        with self.assertRaises(ValueError):
+            decode_vector(b"\x80\x04legacy")
+
+
+class VectorMigrationTests(TestCase):
+    def test_rollback_decodes_float16_rows(self):
+        migration = importlib.import_module("documents.migrations.0014_encode_vectors")
+        user = User.objects.create_user("vera", password="pw", role="HR")
+        doc = Document.objects.create(uploader=user, file="a.txt")
+        DocumentEmbedding.objects.create(
+            document=doc, vector=encode_vector([3, 4], "float16")
+        )
+
+        migration.convert(DocumentEmbedding, to_binary=False)
+
+        vector = pickle.loads(bytes(DocumentEmbedding.objects.get().vector))
+        self.assertEqual(vector.dtype, np.float32)
+        np.testing.assert_allclose(vector, [0.6, 0.8], atol=1e-3)
+
+
+@override_settings(VECTOR_INDEX_SYNC_INTERVAL=0)
+class VectorIndexTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("dave", password="pw", role="Legal")
+        self.index = VectorIndex()
+        rng = np.random.default_rng(0)
+        self.vectors = rng.standard_normal((30, 8))
+        for i, vector in enumerate(self.vectors):
+            self.add(["Legal", "HR"][i % 2], vector)
+        # Two exact ties, to check ordering by document id.
+        self.add("Legal", self.vectors[0])
+        self.add("Legal", self.vectors[0])
+
+    def add(self, category, vector):
+        doc = Document.objects.create(
+            uploader=self.user, file="doc.txt", category=category
+        )
+        DocumentEmbedding.objects.create(document=doc, vector=encode_vector(vector))
+        return doc
+
+    def brute_force(self, query, category=None, k=5):
+        """The per-row loop the search views used to run."""
+        results = []
+        for emb in DocumentEmbedding.objects.select_related("document"):
+            if category and emb.document.category != category:
+                continue
+            vec = decode_vector(emb.vector)
+            results.append(
+                (float(vec @ query / np.linalg.norm(query)), emb.document_id)
+            )
+        results.sort(key=lambda x: x[0], reverse=True)
+        return [doc_id for _, doc_id in results[:k]]
+
+    def test_matches_brute_force_ranking(self):
+        query = self.vectors[0] + 0.01
+        for category in [None, "Legal", "HR"]:
+            hits = self.index.search(query, [category] if category else None, k=5)
+            self.assertEqual(
+                [doc_id for doc_id, _ in hits], self.brute_force(query, category)
+            )
+
+    def test_follows_writes_from_other_processes(self):
+        self.index.load()
+        doc = self.add("HR", self.vectors[3])
+        DocumentEmbedding.objects.filter(document=doc).update(updated_at=timezone.now())
+        self.assertIn(doc.id, dict(self.index.search(self.vectors[3], ["HR"])))
+
+        Document.objects.filter(id=doc.id).delete()
+        self.assertNotIn(doc.id, dict(self.index.search(self.vectors[3], ["HR"])))
+
+    def test_backfills_embeddings_written_without_signals(self):
+        self.index.load()
+        doc = Document.objects.create(uploader=self.user, file="doc.txt", category="HR")
+        DocumentEmbedding.objects.bulk_create(
+            [DocumentEmbedding(document=doc, vector=encode_vector(-self.vectors[4]))]
+        )
+        self.assertEqual(self.index.search(-self.vectors[4], ["HR"], k=1)[0][0], doc.id)
+
+    @override_settings(VECTOR_INDEX_QUERY_BLOCK=2)  # three queries, two blocks
+    def test_search_many_matches_single_searches(self):
+        queries = [self.vectors[0] + 0.01, self.vectors[7], -self.vectors[3]]
+        for category in [None, ["HR"]]:
+            batched = self.index.search_many(queries, category, k=4)
+            for query, hits in zip(queries, batched):
+                single = self.index.search(query, category, k=4)
+                self.assertEqual([i for i, _ in hits], [i for i, _ in single])
+                np.testing.assert_allclose(
+                    [s for _, s in hits], [s for _, s in single], atol=1e-5
+                )
+
+    @mock.patch("documents.caches.embedder")
+    def test_batch_endpoint_filters_by_role(self, embedder):
+        embedder.encode.side_effect = lambda texts, batch_size: self.vectors[:2]
+        query_embeddings.clear()
+        self.addCleanup(query_embeddings.clear)
+        self.addCleanup(setattr, vector_index, "loaded", False)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.post(
+            "/api/documents/search/batch/",
+            {"queries": ["first", "second", "first"], "k": 3},
+            format="json",
+        )
+        embedder.encode.assert_called_once_with(["first", "second"], batch_size=32)
+        results = response.data["results"]
+        self.assertEqual([len(result["documents"]) for result in results], [3, 3, 3])
+        self.assertEqual(results[0], results[2])
+        self.assertEqual(
+            {doc["category"] for result in results for doc in result["documents"]},
+            {"Legal"},
+        )
+
+    def test_category_change_moves_document(self):
+        doc = self.add("HR", self.vectors[5])
+        vector_index.load()
+        self.addCleanup(setattr, vector_index, "loaded", False)
+        doc.category = "Legal"
+        doc.save()
+        self.assertEqual(
+            vector_index.search(self.vectors[5], ["Legal"], k=1)[0][0], doc.id
+        )
+
+    def test_only_category_changes_touch_the_embedding(self):
+        doc = self.add("HR", self.vectors[5])
+        embedding = DocumentEmbedding.objects.filter(document=doc)
+        before = embedding.get().updated_at
+        doc.title = "Renamed"
+        doc.save()
+        self.assertEqual(embedding.get().updated_at, before)
+        doc.category = "Legal"
+        doc.save()
+        self.assertGreater(embedding.get().updated_at, before)
+
+
+class QueryEmbeddingCacheTests(SimpleTestCase):
+    def test_evicts_least_recently_used_and_expires(self):
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.get("a"), cache.get("c")), (1, 3))
+
+        with mock.patch("documents.caches.time.monotonic", return_value=1e12):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["hits"], 3)
+
+    @mock.patch("documents.caches.embedder")
+    def test_repeated_queries_are_encoded_once(self, embedder):
+        embedder.encode.side_effect = lambda text: np.ones(4)
+        query_embeddings.clear()
+        self.addCleanup(query_embeddings.clear)
+
+        first = embed_query("Leave  policy")
+        self.assertIs(embed_query(" leave policy "), first)
+        embedder.encode.assert_called_once_with("leave policy")
+        self.assertEqual(query_embeddings.stats()["hit_rate"], 0.5)
+
+
+class SearchResultCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("frank", password="pw", role="HR")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.docs = [
+            Document.objects.create(uploader=self.user, file="a.txt", category="HR")
+            for _ in range(12)
+        ]
+        self.hits = [(doc.id, 0.5) for doc in self.docs]
+
+    def test_later_pages_reuse_the_ranking(self):
+        with mock.patch(
+            "documents.views.search_documents", return_value=self.hits
+        ) as search:
+            first = self.client.get("/api/documents/", {"query": "leave"})
+            second = self.client.get(first.data["next"].replace("leave", "Leave"))
+        search.assert_called_once()
+        self.assertEqual(len(first.data["results"]) + len(second.data["results"]), 12)
+
+    def test_writes_invalidate_cached_rankings(self):
+        with mock.patch(
+            "documents.views.search_documents", return_value=self.hits
+        ) as search:
+            self.client.get("/api/documents/", {"query": "leave"})
+            self.docs[0].delete()
+            response = self.client.get("/api/documents/", {"query": "leave"})
+        self.assertEqual(search.call_count, 2)
+        results = [doc["id"] for doc in response.data["results"]]
+        self.assertNotIn(self.docs[0].id, results)
+
+    def test_miss_syncs_index_before_ranking(self):
+        # Another process wrote an embedding and bumped the generation; this
+        # process's index must catch up before the ranking is cached.
+        calls = []
+
+        def search():
+            calls.append(("search",))
+            return self.hits
+
+        with mock.patch("documents.caches.vector_index") as index:
+            index.sync.side_effect = lambda force: calls.append(("sync", force))
+            cached_search("leave", self.user, search)
+            cached_search("leave", self.user, search)
+        self.assertEqual(calls, [("sync", True), ("search",)])
+
+
+class KeywordSearchTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user("gina", password="pw", role="Finance")
+        texts = [
+            ("Invoice INV-2024-001", "Payment due for consulting services"),
+            ("Invoice INV-2024-002", "Payment due for hardware and services"),
+            ("Leave policy", "Employees accrue annual leave monthly"),
+        ]
+        self.docs = [
+            Document.objects.create(uploader=user, file="a.txt", category=category)
+            for category in ["Finance", "Finance", "HR"]
+        ]
+        index_terms([(doc, list(text)) for doc, text in zip(self.docs, texts)])
+
+    def test_tokenize_splits_identifiers(self):
+        self.assertEqual(
+            tokenize("INV-2024-001, Bob_Smith"), ["inv", "2024", "001", "bob", "smith"]
+        )
+
+    def test_exact_identifier_ranks_first(self):
+        hits = bm25_search("inv 2024 001", k=None)
+        self.assertEqual(
+            [doc_id for doc_id, _ in hits], [self.docs[0].id, self.docs[1].id]
+        )
+        self.docs[0].refresh_from_db()
+        self.assertEqual(self.docs[0].token_count, 9)
+
+    def test_category_filter_and_rarer_terms(self):
+        self.assertEqual(bm25_search("leave", ["Finance"]), [])
+        hits = bm25_search("services consulting")
+        self.assertEqual(hits[0][0], self.docs[0].id)
+
+    def test_hybrid_fuses_both_rankings(self):
+        fused = fuse_rankings([[(1, 0.9), (2, 0.8)], [(2, 12.0), (3, 4.0)]], k=3)
+        self.assertEqual([doc_id for doc_id, _ in fused], [2, 1, 3])
+
+        vector_hits = [(self.docs[2].id, 0.7), (self.docs[1].id, 0.6)]
+        with mock.patch("documents.search.embed_query"), mock.patch(
+            "documents.search.semantic_search", return_value=vector_hits
+        ):
+            hits = search_documents("INV-2024-002", mode="hybrid", k=2)
+        self.assertEqual(hits[0][0], self.docs[1].id)
+
+
+class SearchPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("hank", password="pw", role="HR")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.docs = [
+            Document.objects.create(uploader=self.user, file="a.txt", category="HR")
+            for _ in range(25)
+        ]
+
+    def walk(self, params):
+        """Follow "next" links to the end; returns the document ids seen."""
+        response = self.client.get("/api/documents/", params)
+        seen = [doc["id"] for doc in response.data["results"]]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            seen += [doc["id"] for doc in response.data["results"]]
+        return seen, response
+
+    def test_cursor_pages_through_all_k_results(self):
+        hits = [(doc.id, 1.0 - i / 100) for i, doc in enumerate(self.docs)]
+        with mock.patch(
+            "documents.views.search_documents", return_value=hits
+        ) as search:
+            seen, last = self.walk({"query": "policy", "k": 25})
+        self.assertEqual(seen, [doc.id for doc in self.docs])
+        self.assertEqual(search.call_args.kwargs["k"], 25)
+        self.assertEqual(last.data["count"], 25)
+        self.assertIsNotNone(last.data["previous"])
+
+    def test_count_leaves_out_deleted_documents(self):
+        hits = [(doc.id, 1.0 - i / 100) for i, doc in enumerate(self.docs)]
+        self.docs[3].delete()
+        with mock.patch("documents.views.search_documents", return_value=hits):
+            seen, last = self.walk({"query": "policy", "k": 25})
+        self.assertEqual(len(seen), 24)
+        self.assertEqual(last.data["count"], 24)
+
+    def test_tied_scores_are_neither_repeated_nor_skipped(self):
+        # Cursors must survive the ranking being recomputed between pages.
+        cache_off = override_settings(SEARCH_CACHE_TTL=0)
+        cache_off.enable()
+        self.addCleanup(cache_off.disable)
+        index = VectorIndex()
+        for doc in self.docs:
+            DocumentEmbedding.objects.create(document=doc, vector=encode_vector([1, 0]))
+        with mock.patch("documents.search.embed_query", return_value=np.array([1, 0])):
+            with mock.patch("documents.search.vector_index", index):
+                seen, _ = self.walk({"query": "policy", "k": 25})
+        self.assertEqual(seen, sorted(doc.id for doc in self.docs))
+
+    def test_cursor_round_trip_and_rejects_garbage(self):
+        self.assertEqual(decode_cursor(encode_cursor(0.25, 7)), (0.25, 7))
+        response = self.client.get("/api/documents/", {"query": "x", "cursor": "%%%"})
+        self.assertEqual(response.status_code, 400)
+
+
+class EmbeddingStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.path = f"{tempfile.mkdtemp()}/test.embeddings"
+        self.writer = EmbeddingStore(self.path)
+        self.reader = EmbeddingStore(self.path)
+        self.now = timezone.now()
+
+    def test_readers_see_appends_updates_and_deletes(self):
+        self.writer.append([(1, self.now, [1, 0, 0]), (2, self.now, [0, 2, 0])])
+        self.assertEqual(self.reader.refresh(), (True, {1, 2}))
+        self.assertFalse(self.reader.matrix.flags.writeable)
+
+        self.writer.append([(1, self.now, [0, 0, 3]), (2, self.now, None)])
+        self.assertEqual(self.reader.refresh(), (False, {1, 2}))
+        self.assertEqual(list(self.reader.live), [1])
+        row = self.reader.live[1][0]
+        np.testing.assert_allclose(self.reader.matrix[row], [0, 0, 1])
+
+    def test_compaction_keeps_current_rows(self):
+        self.writer.append([(1, self.now, [1, 0]), (2, self.now, [0, 1])])
+        self.writer.append([(1, self.now, [1, 1]), (3, self.now, [1, 0])])
+        self.reader.refresh()
+
+        self.assertEqual(self.writer.compact(keep={1, 2}), (4, 2))
+        reset, _ = self.reader.refresh()
+        self.assertTrue(reset)
+        self.assertEqual(sorted(self.reader.live), [1, 2])
+        np.testing.assert_allclose(
+            self.reader.matrix[self.reader.live[1][0]], [2**-0.5, 2**-0.5], rtol=1e-6
+        )
+
+
+@override_settings(VECTOR_INDEX_SYNC_INTERVAL=0)
+class ANNIndexTests(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        centres = rng.standard_normal((10, 16))
+        self.vectors = centres[rng.integers(10, size=500)]
+        self.vectors += 0.1 * rng.standard_normal(self.vectors.shape)
+        self.categories = ["Legal", "HR"] * 250
+        self.index = IVFIndex.build(
+            self.vectors, np.arange(500), self.categories, n_lists=20
+        )
+
+    def test_probing_every_list_is_exact(self):
+        query = self.vectors[7]
+        ids, _ = self.index.search(query, 10, n_probe=20, categories=["HR"])
+        normed = self.vectors / np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        scores = np.where(np.array(self.categories) == "HR", normed @ query, -np.inf)
+        self.assertEqual(set(ids.tolist()), set(np.argsort(-scores)[:10].tolist()))
+
+    def test_round_trips_through_disk(self):
+        path = f"{tempfile.mkdtemp()}/ann.npz"
+        self.index.save(path)
+        loaded = IVFIndex.load(path)
+        self.assertEqual(loaded.built_at, self.index.built_at)
+        self.assertEqual(
+            loaded.search(self.vectors[3], 5, 4)[0].tolist(),
+            self.index.search(self.vectors[3], 5, 4)[0].tolist(),
+        )
+
+    def test_embeddings_written_during_build_are_rescored(self):
+        user = User.objects.create_user("finn", password="pw", role="Legal")
+        docs = [
+            Document.objects.create(uploader=user, file="a.txt", category="Legal")
+            for _ in range(3)
+        ]
+        for doc, vector in zip(docs[:2], self.vectors):
+            DocumentEmbedding.objects.create(document=doc, vector=encode_vector(vector))
+        build = IVFIndex.build
+
+        def build_while_writing(*args, **kwargs):
+            # Written after the embeddings were read, before the index exists.
+            DocumentEmbedding.objects.create(
+                document=docs[2], vector=encode_vector(self.vectors[5])
+            )
+            return build(*args, **kwargs)
+
+        with mock.patch.object(IVFIndex, "build", side_effect=build_while_writing):
+            ann = build_from_database(n_lists=1)
+        self.assertEqual(len(ann), 2)
+        with override_settings(ANN_MIN_VECTORS=1), mock.patch(
+            "documents.search.get_ann_index", return_value=ann
+        ):
+            hits = semantic_search(self.vectors[5], ["Legal"], k=1)
+        self.assertEqual(hits[0][0], docs[2].id)
+
+    def test_search_sees_changes_since_build(self):
+        user = User.objects.create_user("erin", password="pw", role="Legal")
+        docs = [
+            Document.objects.create(uploader=user, file="a.txt", category="Legal")
+            for _ in range(3)
+        ]
+        for doc, vector in zip(docs, self.vectors):
+            DocumentEmbedding.objects.create(document=doc, vector=encode_vector(vector))
+        ann = IVFIndex.build(
+            self.vectors[:2], [docs[0].id, docs[1].id], ["Legal", "Legal"], n_lists=1
+        )
+        ann.built_at = timezone.now()
+        docs[0].delete()  # deleted after the build
+        DocumentEmbedding.objects.filter(document=docs[2]).update(
+            updated_at=timezone.now()
+        )
+        with override_settings(ANN_MIN_VECTORS=1), mock.patch(
+            "documents.search.get_ann_index", return_value=ann
+        ):
+            hits = semantic_search(self.vectors[2], ["Legal"], k=2)
+        # docs[2] was never in the index; it is scored exactly as a fresh row.
+        self.assertEqual({doc_id for doc_id, _ in hits}, {docs[1].id, docs[2].id})
+
+
+@override_settings(
+    ACCESS_LOG_MODE="buffered",
+    ACCESS_LOG_BUFFER_SIZE=3,
+    ACCESS_LOG_FLUSH_INTERVAL=3600,
+)
+class AccessLogBufferTests(TestCase):
+    def setUp(self):
+        access_log_buffer.flush()
+        self.user = User.objects.create_user("gus", password="pw", role="HR")
+        self.doc = Document.objects.create(uploader=self.user, file="a.txt")
+
+    def tearDown(self):
+        access_log_buffer.flush()
+
+    def test_events_are_written_in_batches_with_their_own_time(self):
+        log_access(self.user, "login")
+        log_access(self.user, "view", self.doc)
+        self.assertEqual(AccessLog.objects.count(), 0)
+        before_flush = timezone.now()
+        self.doc.delete()  # deleted while its event waits in the buffer
+
+        log_access(self.user, "delete")  # the third event fills the batch
+
+        logs = list(AccessLog.objects.order_by("timestamp"))
+        self.assertEqual([log.action for log in logs], ["login", "view", "delete"])
+        self.assertIsNone(logs[1].document)
+        self.assertLess(logs[1].timestamp, before_flush)
+        self.assertEqual(os.listdir(_journal_dir()), [])
+
+    def test_overdue_events_are_not_flushed_in_the_request(self):
+        access_log_buffer._flushed_at -= 7200  # idle for longer than the interval
+        log_access(self.user, "view", self.doc)
+        self.assertEqual(AccessLog.objects.count(), 0)
+        self.assertEqual(access_log_buffer.stats()["buffered"], 1)
+
+    def test_events_of_another_database_are_dropped(self):
+        log_access(self.user, "view", self.doc)
+        # The test database is destroyed and the real one is back.
+        with mock.patch.dict(connection.settings_dict, {"NAME": "db.sqlite3"}):
+            self.assertEqual(access_log_buffer.flush(), 0)
+        self.assertEqual(AccessLog.objects.count(), 0)
+        self.assertEqual(os.listdir(_journal_dir()), [])
+
+    def test_sync_mode_writes_immediately(self):
+        with override_settings(ACCESS_LOG_MODE="sync"):
+            log_access(self.user, "view", self.doc)
+        self.assertEqual(AccessLog.objects.get().document, self.doc)
+
+    def test_journals_of_dead_processes_are_replayed(self):
+        event = {
+            "user_id": self.user.id,
+            "document_id": self.doc.id,
+            "action": "view",
+            "timestamp": timezone.now().isoformat(),
+        }
+        os.makedirs(_journal_dir(), exist_ok=True)
+        path = os.path.join(_journal_dir(), "access-999999999.jsonl")
+        with open(path, "w") as f:
+            # The process died halfway through its last line.
+            f.write(json.dumps(event) + "\n" + json.dumps(event)[:20])
+
+        self.assertEqual(replay_journals(), 1)
+        self.assertEqual(AccessLog.objects.get().document, self.doc)
+        self.assertFalse(os.path.exists(path))
+
+    def test_buffer_starts_once_and_replays_off_the_request_path(self):
+        buffer = AccessLogBuffer()
+        replaying, release = threading.Event(), threading.Event()
+
+        def slow_replay():
+            replaying.set()
+            release.wait(5)
+
+        event = {
+            "user_id": self.user.id,
+            "document_id": None,
+            "action": "login",
+            "timestamp": timezone.now().isoformat(),
+        }
+        with mock.patch(
+            "documents.audit.replay_journals", side_effect=slow_replay
+        ) as replay, mock.patch("documents.audit.atexit.register") as register:
+            threads = [
+                threading.Thread(target=buffer.add, args=(event,)) for _ in range(2)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(5)
+            # Both events are buffered while the replay is still running.
+            self.assertEqual(buffer.stats()["buffered"], 2)
+            self.assertTrue(replaying.wait(5))
+            release.set()
+
+        replay.assert_called_once()
+        register.assert_called_once_with(buffer.flush)
+        self.assertEqual(buffer.flush(), 2)
+
+
+class AccessLogRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("hal", password="pw", role="HR")
+        self.doc = Document.objects.create(
+            uploader=self.user, file="a.txt", category="HR"
+        )
+        self.t0 = datetime(2025, 3, 1, 9, 15, tzinfo=dt_timezone.utc)
+
+    def log(self, action, minutes, document=None):
+        return AccessLog.objects.create(
+            user=self.user,
+            document=document,
+            action=action,
+            timestamp=self.t0 + timedelta(minutes=minutes),
+        )
+
+    def test_rollups_are_incremental(self):
+        self.log("view", 0, self.doc)
+        self.log("view", 30, self.doc)
+        self.log("view", 60, self.doc)
+        self.log("login", 5)
+        self.assertEqual(roll_up(), 4)
+        self.assertEqual(roll_up(), 0)
+
+        self.log("view", 10, self.doc)  # written late by a buffered writer
+        self.assertEqual(roll_up(batch_size=1), 1)
+
+        hourly = AccessLogHourly.objects.filter(action="view").order_by("bucket")
+        self.assertEqual(
+            [(row.bucket.hour, row.count) for row in hourly], [(9, 3), (10, 1)]
+        )
+        daily = AccessLogDaily.objects.get(action="view")
+        self.assertEqual(
+            (daily.bucket, daily.count), (self.t0.replace(hour=0, minute=0), 4)
+        )
+
+    def test_archive_moves_old_rolled_up_rows_to_gzip(self):
+        old = self.log("view", 0, self.doc)
+        roll_up()
+        self.log("view", 1, self.doc)  # not rolled up yet: kept
+        recent = AccessLog.objects.create(user=self.user, action="login")
+
+        with override_settings(ACCESS_LOG_ARCHIVE_DIR=tempfile.mkdtemp()):
+            archived, path = archive(timezone.now() - timedelta(days=90))
+
+        self.assertEqual(archived, 1)
+        with gzip.open(path, "rt") as f:
+            self.assertEqual([json.loads(line)["id"] for line in f], [old.id])
+        self.assertFalse(AccessLog.objects.filter(id=old.id).exists())
+        self.assertTrue(AccessLog.objects.filter(id=recent.id).exists())
+        self.assertEqual(AccessLogDaily.objects.get().count, 1)
+
+    def test_analytics_endpoint_reads_rollups(self):
+        other = User.objects.create_user("ida", password="pw", role="Finance")
+        finance_doc = Document.objects.create(
+            uploader=other, file="b.txt", category="Finance"
+        )
+        self.log("view", 0, self.doc)
+        self.log("view", 70, self.doc)
+        self.log("upload", 5, self.doc)
+        self.log("view", 0, finance_doc)
+        roll_up()
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.get(
+            "/api/accesslogs/analytics/",
+            {"period": "day", "since": "2025-03-01", "until": "2025-03-02"},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row["action"], row["count"]) for row in response.data["results"]],
+            [("upload", 1), ("view", 2)],  # the Finance document is not counted
+        )
+        response = client.get(
+            "/api/accesslogs/analytics/",
+            {"period": "hour", "since": "2025-03-01", "group_by": "document"},
+        )
+        self.assertEqual([row["count"] for row in response.data["results"]], [2, 1])
+        bad = client.get("/api/accesslogs/analytics/", {"period": "week"})
+        self.assertEqual(bad.status_code, 400)
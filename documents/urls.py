@@ -1,5 +1,5 @@
 from django.urls import path, include
-from .views import SemanticSearchAPIView
+from .views import BatchSemanticSearchAPIView, SemanticSearchAPIView
 from rest_framework.routers import DefaultRouter
 from .views import (
     DocumentViewSet,
@@ -15,6 +15,11 @@ router.register(r"accesslogs", AccessLogViewSet)
 
 urlpatterns = [
     path("documents/search/", SemanticSearchAPIView.as_view(), name="semantic-search"),
+    path(
+        "documents/search/batch/",
+        BatchSemanticSearchAPIView.as_view(),
+        name="batch-semantic-search",
+    ),
     path("", include(router.urls)),
     path("stats/", DocumentStatsAPIView.as_view(), name="document-stats"),
 ]
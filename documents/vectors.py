@@ -0,0 +1,59 @@
+"""
+Binary encoding for embedding vectors stored in BinaryFields.
+
+Layout: 2-byte magic ``b"DV"``, 1-byte format version, 1-byte dtype code,
+then the raw little-endian components. Vectors are L2-normalized before
+encoding, so cosine similarity is a plain dot product after decoding.
+"""
+
+import numpy as np
+from django.conf import settings
+
+MAGIC = b"DV"
+VERSION = 1
+HEADER_SIZE = 4
+DTYPE_CODES = {1: np.dtype("<f4"), 2: np.dtype("<f2")}
+CODES_BY_NAME = {"float32": 1, "float16": 2}
+
+
+def normalize(vec):
+    vec = np.asarray(vec, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+def encode_vector(vec, dtype=None):
+    """Normalize ``vec`` and pack it as header + raw float32/float16 bytes."""
+    code = CODES_BY_NAME[dtype or settings.VECTOR_DTYPE]
+    payload = normalize(vec).astype(DTYPE_CODES[code]).tobytes()
+    return MAGIC + bytes([VERSION, code]) + payload
+
+
+def _header(blob):
+    header = bytes(blob[:HEADER_SIZE])
+    if header[:2] != MAGIC or header[2] != VERSION or header[3] not in DTYPE_CODES:
+        raise ValueError("Not an encoded vector (run the vector migration first)")
+    return DTYPE_CODES[header[3]]
+
+
+def decode_vector(blob):
+    """
+    Zero-copy, read-only view of an encoded vector in its stored dtype.
+    Works with bytes (SQLite) and memoryview (PostgreSQL) values.
+    """
+    return np.frombuffer(blob, dtype=_header(blob), offset=HEADER_SIZE)
+
+
+def decode_matrix(blobs, dim=None):
+    """Decode many encoded vectors into one float32 (n, dim) matrix."""
+    blobs = list(blobs)
+    if not blobs:
+        return np.empty((0, dim or 0), dtype=np.float32)
+    dtype = _header(blobs[0])
+    header = bytes(blobs[0][:HEADER_SIZE])
+    if any(bytes(blob[:HEADER_SIZE]) != header for blob in blobs):
+        # Rows written with different VECTOR_DTYPE settings.
+        return np.stack([decode_vector(blob).astype(np.float32) for blob in blobs])
+    payload = b"".join(bytes(blob[HEADER_SIZE:]) for blob in blobs)
+    matrix = np.frombuffer(payload, dtype=dtype).reshape(len(blobs), -1)
+    return matrix.astype(np.float32, copy=False)
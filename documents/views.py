@@ -2,24 +2,45 @@ from rest_framework.views import APIView
 from rest_framework import viewsets, permissions
 from rest_framework.response import Response
 from .models import Document, DocumentEmbedding
-from .signals import embedder  # use the same SentenceTransformer
 from .models import Document, DocumentEmbedding, AccessLog
+from django.conf import settings
 from django.db import models
-import pickle
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+from django.db.models import Sum
+from django.http import FileResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+import os
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.decorators import action
-from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from .audit import access_log_buffer, log_access
+from .caches import cached_search, embed_queries, query_embeddings
+from .dedup import dedup_stats
+from .index import vector_index
+from .pagination import RankedCursorPagination
+from .rollups import ROLLUPS
+from .search import SEARCH_MODES, documents_for, search_documents
 from .serializers import (
     DocumentSerializer,
     DocumentEmbeddingSerializer,
     AccessLogSerializer,
+    IngestionJobSerializer,
 )
 
 
+def int_param(value, default=None, minimum=1, maximum=None):
+    """Parse an optional positive integer request parameter, clamped to range."""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    value = max(minimum, value)
+    return min(value, maximum) if maximum else value
+
+
 class SemanticSearchAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -28,27 +49,91 @@ class SemanticSearchAPIView(APIView):
         if not query:
             return Response({"error": "Query is required"}, status=400)
 
-        # Generate query embedding
-        query_vec = embedder.encode(query).reshape(1, -1)
+        mode = request.data.get("mode", "semantic")
+        if mode not in SEARCH_MODES:
+            return Response(
+                {"error": f"mode must be one of {', '.join(SEARCH_MODES)}"},
+                status=400,
+            )
+        granularity = request.data.get("granularity", "document")
+        n_probe = int_param(request.data.get("n_probe"))
+        k = int_param(request.data.get("k"), 5, maximum=settings.SEARCH_MAX_K)
+        # Role-based filter: only documents in the user's category
+        hits = cached_search(
+            query,
+            request.user,
+            lambda: search_documents(
+                query,
+                categories=[request.user.role],
+                k=k,
+                mode=mode,
+                granularity=granularity,
+                n_probe=n_probe,
+            ),
+            endpoint="semantic",
+            k=k,
+            mode=mode,
+            granularity=granularity,
+            n_probe=n_probe,
+        )
+
+        # Serialize top k
+        serializer = DocumentSerializer(documents_for(hits), many=True)
+        return Response(serializer.data)
 
-        results = []
-        for emb in DocumentEmbedding.objects.select_related("document"):
-            doc = emb.document
-            # Optional: Role-based filter
-            if doc.category != request.user.role:
-                print(doc.category, request.user.role)
-                continue
 
-            doc_vec = pickle.loads(emb.vector).reshape(1, -1)
-            score = cosine_similarity(query_vec, doc_vec)[0][0]
-            results.append((score, doc))
+class BatchSemanticSearchAPIView(APIView):
+    """Run many saved searches in one request: one encode batch, one scoring pass."""
 
-        # Sort by similarity
-        results.sort(key=lambda x: x[0], reverse=True)
+    permission_classes = [permissions.IsAuthenticated]
 
-        # Serialize top 5
-        serializer = DocumentSerializer([doc for _, doc in results[:5]], many=True)
-        return Response(serializer.data)
+    def post(self, request):
+        queries = request.data.get("queries")
+        if (
+            not isinstance(queries, list)
+            or not queries
+            or not all(isinstance(query, str) and query.strip() for query in queries)
+        ):
+            return Response(
+                {"error": "queries must be a non-empty list of strings"}, status=400
+            )
+        if len(queries) > settings.SEARCH_BATCH_MAX_QUERIES:
+            return Response(
+                {
+                    "error": f"At most {settings.SEARCH_BATCH_MAX_QUERIES} "
+                    "queries per request"
+                },
+                status=400,
+            )
+        k = int_param(request.data.get("k"), 5, maximum=settings.SEARCH_MAX_K)
+
+        # Role-based filter, as for single searches
+        all_hits = vector_index.search_many(
+            embed_queries(queries), categories=[request.user.role], k=k
+        )
+
+        documents = Document.objects.in_bulk(
+            {doc_id for hits in all_hits for doc_id, _ in hits}
+        )
+        serialized = {
+            doc["id"]: doc
+            for doc in DocumentSerializer(list(documents.values()), many=True).data
+        }
+        return Response(
+            {
+                "results": [
+                    {
+                        "query": query,
+                        "documents": [
+                            serialized[doc_id]
+                            for doc_id, _ in hits
+                            if doc_id in serialized
+                        ],
+                    }
+                    for query, hits in zip(queries, all_hits)
+                ]
+            }
+        )
 
 
 class DocumentViewSet(viewsets.ModelViewSet):
@@ -70,23 +155,55 @@ class DocumentViewSet(viewsets.ModelViewSet):
         query = request.query_params.get("query", "").strip()
 
         if query:  # Perform semantic search
-            query_vec = embedder.encode(query).reshape(1, -1)
-            results = []
-
-            for emb in DocumentEmbedding.objects.select_related("document"):
-                doc = emb.document
-                # Superuser can see everything, normal users only their role
-                if not request.user.is_superuser and doc.category != request.user.role:
-                    continue
-
-                doc_vec = pickle.loads(emb.vector).reshape(1, -1)
-                score = cosine_similarity(query_vec, doc_vec)[0][0]
-                results.append((score, doc))
+            # Superuser can see everything, normal users only their role
+            categories = None if request.user.is_superuser else [request.user.role]
+            mode = request.query_params.get("mode", "semantic")
+            if mode not in SEARCH_MODES:
+                return Response(
+                    {"error": f"mode must be one of {', '.join(SEARCH_MODES)}"},
+                    status=400,
+                )
+            # Ranked results page by cursor: ?cursor= from the "next" link
+            paginator = RankedCursorPagination(request)
+            granularity = request.query_params.get("granularity", "document")
+            n_probe = int_param(request.query_params.get("n_probe"))
+            k = int_param(
+                request.query_params.get("k"),
+                settings.SEARCH_DEFAULT_K,
+                maximum=settings.SEARCH_MAX_K,
+            )
+            # Ranking is cached, so later pages don't recompute it
+            hits = cached_search(
+                query,
+                request.user,
+                lambda: search_documents(
+                    query,
+                    categories=categories,
+                    k=k,
+                    mode=mode,
+                    granularity=granularity,
+                    n_probe=n_probe,
+                ),
+                endpoint="list",
+                k=k,
+                mode=mode,
+                granularity=granularity,
+                n_probe=n_probe,
+            )
+            # Drop documents deleted since the ranking was cached, so pages
+            # stay full and "count" matches what the pages hold
+            existing = set(
+                Document.objects.filter(
+                    id__in=[doc_id for doc_id, _ in hits]
+                ).values_list("id", flat=True)
+            )
+            hits = [hit for hit in hits if hit[0] in existing]
+            page = paginator.paginate_hits(hits)
+            serializer = self.get_serializer(documents_for(page), many=True)
+            return paginator.get_paginated_response(serializer.data)
 
-            results.sort(key=lambda x: x[0], reverse=True)
-            docs = [doc for _, doc in results[:5]]
-        else:  # Default: all docs (filtered in get_queryset)
-            docs = self.get_queryset()
+        # Default: all docs (filtered in get_queryset)
+        docs = self.get_queryset()
 
         # ✅ Apply DRF pagination
         paginator = PageNumberPagination()
@@ -97,15 +214,26 @@ class DocumentViewSet(viewsets.ModelViewSet):
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
-        AccessLog.objects.create(user=request.user, document=instance, action="view")
+        log_access(request.user, "view", instance)
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
+    @action(detail=True, methods=["get"], url_path="status")
+    def ingestion_status(self, request, pk=None):
+        """Poll the latest ingestion job of a document."""
+        doc = self.get_object()
+        job = doc.ingestion_jobs.order_by("-created_at", "-id").first()
+        if job is None:
+            return Response({"error": "No ingestion job for this document"}, status=404)
+        return Response(IngestionJobSerializer(job).data)
+
     def perform_create(self, serializer):
+        # NLP processing is queued by the post_save signal and picked up by
+        # `manage.py ingestion_worker`, so the upload returns immediately.
         doc = serializer.save(
             uploader=self.request.user, category=self.request.user.role
         )
-        AccessLog.objects.create(user=self.request.user, document=doc, action="upload")
+        log_access(self.request.user, "upload", doc)
 
     def perform_update(self, serializer):
         if not self.request.user.is_superuser and serializer.instance.category not in [
@@ -114,7 +242,7 @@ class DocumentViewSet(viewsets.ModelViewSet):
         ]:
             raise PermissionError("You are not allowed to update this document.")
         doc = serializer.save()
-        AccessLog.objects.create(user=self.request.user, document=doc, action="update")
+        log_access(self.request.user, "update", doc)
 
     def perform_destroy(self, instance):
         if not self.request.user.is_superuser and instance.category not in [
@@ -122,9 +250,8 @@ class DocumentViewSet(viewsets.ModelViewSet):
             "Unknown",
         ]:
             raise PermissionError("You are not allowed to delete this document.")
-        AccessLog.objects.create(
-            user=self.request.user, document=instance, action="delete"
-        )
+        # Logged without the document: its log rows are deleted along with it.
+        log_access(self.request.user, "delete")
         instance.delete()
 
     def pdf(self, request, pk=None):
@@ -143,7 +270,7 @@ class DocumentViewSet(viewsets.ModelViewSet):
         if not os.path.exists(file_path):
             return Response({"error": "File not found"}, status=404)
 
-        AccessLog.objects.create(user=user, document=doc, action="view")
+        log_access(user, "view", doc)
         return FileResponse(open(file_path, "rb"), content_type="application/pdf")
 
 
@@ -162,6 +289,21 @@ class DocumentEmbeddingViewSet(viewsets.ModelViewSet):
         )
 
 
+def parse_moment(value, name):
+    """An aware datetime from an ISO date or datetime query parameter."""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValidationError({name: "Expected an ISO date or datetime"})
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, dt_timezone.utc)
+    return moment
+
+
 class AccessLogViewSet(viewsets.ModelViewSet):
     queryset = AccessLog.objects.all().order_by("-timestamp")
     serializer_class = AccessLogSerializer
@@ -181,6 +323,50 @@ class AccessLogViewSet(viewsets.ModelViewSet):
             .order_by("-timestamp")
         )
 
+    @action(detail=False, methods=["get"])
+    def analytics(self, request):
+        """
+        Event counts per hour or day from the rollup tables (up to the last
+        `manage.py rollup_access_logs` run).
+
+        ?period=hour|day (default day), ?since= / ?until= (ISO dates or
+        datetimes, default the last 30 days), ?group_by= any of action, user,
+        document, comma-separated (default action).
+        """
+        period = request.query_params.get("period", "day")
+        if period not in ROLLUPS:
+            raise ValidationError({"period": f"Expected one of {', '.join(ROLLUPS)}"})
+        group_by = request.query_params.get("group_by", "action").split(",")
+        if not set(group_by) <= {"action", "user", "document"}:
+            raise ValidationError({"group_by": "Expected action, user and/or document"})
+
+        until = parse_moment(request.query_params.get("until"), "until")
+        since = parse_moment(request.query_params.get("since"), "since")
+        until = until or timezone.now()
+        since = since or until - timedelta(days=30)
+
+        rollup = ROLLUPS[period][0].objects.filter(bucket__gte=since, bucket__lt=until)
+        if not request.user.is_superuser:
+            rollup = rollup.filter(document__uploader__role=request.user.role)
+        fields = ["bucket"] + [
+            f"{field}_id" if field != "action" else field for field in group_by
+        ]
+        limit = settings.ACCESS_LOG_ANALYTICS_MAX_BUCKETS
+        rows = list(
+            rollup.values(*fields)
+            .annotate(count=Sum("count"))
+            .order_by(*fields)[: limit + 1]
+        )
+        return Response(
+            {
+                "period": period,
+                "since": since,
+                "until": until,
+                "truncated": len(rows) > limit,
+                "results": rows[:limit],
+            }
+        )
+
 
 class DocumentStatsAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]  # or allow any if public
@@ -205,5 +391,8 @@ class DocumentStatsAPIView(APIView):
                 "legal_documents": legal_docs,
                 "contracts_documents": contracts_docs,
                 "technical_reports_documents": technical_reports_docs,
+                "deduplication": dedup_stats(),
+                "query_embedding_cache": query_embeddings.stats(),
+                "access_log_buffer": access_log_buffer.stats(),
             }
         )
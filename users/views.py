@@ -3,7 +3,7 @@ from rest_framework.response import Response
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.tokens import RefreshToken
 from .serializers import RegisterSerializer, UserSerializer
-from documents.models import AccessLog
+from documents.audit import log_access
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
@@ -15,7 +15,7 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         data = super().validate(attrs)
 
         # ✅ Log login here
-        AccessLog.objects.create(user=self.user, action="login")
+        log_access(self.user, "login")
 
         return data
 
@@ -47,11 +47,7 @@ class LogoutView(generics.GenericAPIView):
             refresh_token = request.data["refresh"]
             token = RefreshToken(refresh_token)
             token.blacklist()
-            AccessLog.objects.create(
-                user=request.user,
-                document=None,  # no document involved
-                action="logout",
-            )
+            log_access(request.user, "logout")  # no document involved
             return Response({"detail": "Successfully logged out."})
         except Exception:
             return Response({"error": "Invalid token."}, status=400)